@@ -1,10 +1,13 @@
 from django.contrib import admin
-from .models import Post, Comment, Category
+from django.utils import timezone
+from .models import Post, Comment, Category, CommentSubmission
+from . import moderation
+from .cache import bump
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'created_at']
+    list_display = ['name', 'slug', 'published_post_count', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
@@ -38,19 +41,46 @@ class PostAdmin(admin.ModelAdmin):
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ['post', 'author', 'created_at', 'approved']
-    list_filter = ['approved', 'created_at', 'post']
+    list_display = ['post', 'author', 'created_at', 'moderation_status', 'moderation_note']
+    list_filter = ['moderation_status', 'created_at', 'post']
     search_fields = ['content', 'author__username', 'post__title']
     raw_id_fields = ['post', 'author']
+    readonly_fields = ['moderation_note']
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
     
-    actions = ['approve_comments', 'disapprove_comments']
+    actions = ['approve_comments', 'disapprove_comments', 'rerun_moderation']
     
     def approve_comments(self, request, queryset):
-        queryset.update(approved=True)
+        self.set_status(queryset, Comment.Moderation.APPROVED)
     approve_comments.short_description = "Approve selected comments"
-    
+
     def disapprove_comments(self, request, queryset):
-        queryset.update(approved=False)
-    disapprove_comments.short_description = "Disapprove selected comments"
+        self.set_status(queryset, Comment.Moderation.REJECTED)
+    disapprove_comments.short_description = "Reject selected comments"
+
+    def rerun_moderation(self, request, queryset):
+        outcomes = moderation.moderate(list(queryset.order_by('pk').only(
+            'pk', 'post_id', 'author_id', 'content', 'content_hash', 'created_at', 'approved'
+        )))
+        self.message_user(request, ', '.join(
+            f'{count} {Comment.Moderation(status).label.lower()}' for status, count in outcomes.items()
+        ))
+    rerun_moderation.short_description = "Re-run moderation rules on selected comments"
+
+    def set_status(self, queryset, status):
+        post_ids = set(queryset.values_list('post_id', flat=True))
+        # update() skips auto_now; rankings and Last-Modified read updated_at
+        queryset.update(
+            moderation_status=status, moderation_note='', approved=status == Comment.Moderation.APPROVED,
+            updated_at=timezone.now(),
+        )
+        # update() sends no signals, so expire the affected pages here
+        bump('comment', *(f'post:{pk}' for pk in post_ids))
+
+
+@admin.register(CommentSubmission)
+class CommentSubmissionAdmin(admin.ModelAdmin):
+    list_display = ['post', 'author', 'submitted_at']
+    raw_id_fields = ['post', 'author']
+    ordering = ['pk']
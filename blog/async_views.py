@@ -0,0 +1,132 @@
+"""
+Async versions of the read-only pages, routed by blog/urls.py when
+``BLOG_ASYNC_VIEWS`` is on. Serve them with an ASGI server (see
+DEPLOYMENT.md); under WSGI every async view costs an extra event loop.
+
+Each view loads its main object and then the rest of the page with the
+async ORM. Django runs every async ORM call of a request on the same
+thread (``thread_sensitive``), so the queries still execute one after
+another; what an async view saves is a worker thread per slow client,
+not time per request. Everything a template shows is loaded before
+rendering, except the ranking sidebars, which the (threaded) render
+reads only when their cached fragment has expired. Rendering, pagination
+and the helpers that touch the session, cache or search index stay
+synchronous and run through ``sync_to_async``. Requests other than GET
+(comment submissions) are handed to the synchronous views in blog.views.
+"""
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render
+
+from . import counters, pagecache, rankings, related, search, views
+from .forms import CommentForm
+from .models import Category, Post
+from .pagination import paginate
+from .views import BODY_FIELDS
+
+
+async def _list(queryset):
+    return [obj async for obj in queryset]
+
+
+def _paginate(request, queryset, per_page, keyset=True):
+    """paginate() with the page evaluated, so templates never query from the event loop"""
+    page_obj = paginate(request, queryset, per_page, keyset=keyset)
+    list(page_obj)
+    return page_obj
+
+
+@sync_to_async
+def _revalidate(validator):
+    # Looking for flash messages may load the session.
+    return validator.not_modified()
+
+
+@sync_to_async
+def _render(request, validator, template_name, context):
+    return validator.apply(render(request, template_name, context))
+
+
+async def home(request):
+    """Home page displaying all published posts"""
+    if request.method != 'GET':
+        return await sync_to_async(views.home)(request)
+    request.user = await request.auser()
+    await sync_to_async(pagecache.tag_page)(request, 'post', 'category', 'ranking')
+    posts = Post.objects.filter(published=True).select_related('author', 'category').defer(*BODY_FIELDS)
+
+    search_query = request.GET.get('search')
+    if search_query:
+        posts = await sync_to_async(search.search_posts)(posts, search_query)
+    page_obj = await sync_to_async(_paginate)(request, posts, 6, keyset=not search_query)
+
+    validator = await sync_to_async(views.home_validator)(request, page_obj)
+    not_modified = await _revalidate(validator)
+    if not_modified is not None:
+        return not_modified
+    page_obj.object_list = await sync_to_async(counters.attach_pending_views)(page_obj.object_list)
+
+    featured = Post.objects.filter(published=True, featured=True).defer(*BODY_FIELDS)[:3]
+    featured_posts = await _list(featured)
+    categories = await _list(Category.objects.all())
+
+    return await _render(request, validator, 'blog/home.html', {
+        'page_obj': page_obj,
+        'featured_posts': featured_posts,
+        'categories': categories,
+        # Read while rendering, and only when their sidebar is not cached
+        'trending_posts': rankings.trending(),
+        'popular_posts': rankings.popular(),
+        'search_query': search_query,
+    })
+
+
+async def post_detail(request, slug):
+    """Display a single post with its comments"""
+    if request.method != 'GET':
+        return await sync_to_async(views.post_detail)(request, slug)
+    request.user = await request.auser()
+    await sync_to_async(pagecache.watch)(request, 'post', 'comment', 'category')
+    post = await aget_object_or_404(Post.objects.with_detail_stats(), slug=slug, published=True)
+    await sync_to_async(pagecache.tag_page)(request, *pagecache.post_tags(post), post_id=post.pk)
+
+    validator = await sync_to_async(views.post_validator)(request, post)
+    not_modified = await _revalidate(validator)
+    await sync_to_async(counters.record_view)(post.pk)
+    if not_modified is not None:
+        return not_modified
+
+    comments = await _list(post.comments.filter(approved=True).select_related('author'))
+    related_posts = await sync_to_async(related.related_posts)(post)
+
+    return await _render(request, validator, 'blog/post_detail.html', {
+        'post': post,
+        'comments': comments,
+        'related_posts': related_posts,
+        'form': CommentForm(),
+    })
+
+
+async def category_posts(request, slug):
+    """Display posts by category"""
+    if request.method != 'GET':
+        return await sync_to_async(views.category_posts)(request, slug)
+    request.user = await request.auser()
+    await sync_to_async(pagecache.watch)(request, 'post', 'category')
+    category = await aget_object_or_404(Category, slug=slug)
+    await sync_to_async(pagecache.tag_page)(request, f'category:{category.pk}')
+    posts = Post.objects.filter(
+        category=category, published=True
+    ).select_related('author').defer(*BODY_FIELDS)
+    page_obj = await sync_to_async(_paginate)(request, posts, 6)
+
+    validator = await sync_to_async(views.category_validator)(request, category, page_obj)
+    not_modified = await _revalidate(validator)
+    if not_modified is not None:
+        return not_modified
+    page_obj.object_list = await sync_to_async(counters.attach_pending_views)(page_obj.object_list)
+
+    return await _render(request, validator, 'blog/category_posts.html', {
+        'category': category,
+        'page_obj': page_obj,
+    })
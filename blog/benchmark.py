@@ -0,0 +1,118 @@
+"""
+Helpers for the route benchmark in ``blog.tests.RouteBenchmarkTests``.
+
+The benchmark seeds a large dataset, drives every URL in ``blog.urls``
+through the test client and records, per route, the number of queries, the
+total SQL time and the p50/p95 response time. Results are compared with
+the baselines stored in ``benchmark_baselines.json`` next to this module.
+
+Configuration comes from the environment:
+
+* ``BLOG_BENCH_USERS``, ``BLOG_BENCH_CATEGORIES``, ``BLOG_BENCH_POSTS`` and
+  ``BLOG_BENCH_COMMENTS`` size the dataset.
+* ``BLOG_BENCH=1`` also compares response times with the baselines and
+  prints the report. Without it only query counts are checked, which is
+  deterministic on any machine.
+* ``BLOG_BENCH_REPEAT`` is the number of timed requests per route
+  (default 20 with ``BLOG_BENCH=1``, otherwise 1).
+* ``BLOG_BENCH_THRESHOLD`` is the allowed relative p50 slowdown (0.5 means
+  50% slower than the baseline); query counts may never increase.
+* ``BLOG_BENCH_UPDATE=1`` rewrites the baselines instead of comparing.
+"""
+
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+from django.db import connection
+
+from .datagen import generate
+from .middleware import RequestProfile
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'benchmark_baselines.json'
+
+# Absolute slack on top of the relative threshold, so sub-millisecond
+# routes do not fail on scheduler noise.
+TIMING_SLACK_MS = 5.0
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def dataset_config():
+    return {
+        'users': env_int('BLOG_BENCH_USERS', 200),
+        'categories': env_int('BLOG_BENCH_CATEGORIES', 20),
+        'posts': env_int('BLOG_BENCH_POSTS', 2000),
+        'comments': env_int('BLOG_BENCH_COMMENTS', 6000),
+    }
+
+
+def seed_dataset(users, categories, posts, comments, seed=0):
+    """Bulk-insert a synthetic dataset, see blog.datagen"""
+    generate(users=users, categories=categories, posts=posts, comments=comments, seed=seed)
+
+
+def measure(client, url, repeat):
+    """Time ``repeat`` GETs of ``url`` after one warm-up request"""
+    client.get(url)
+    timings, sql_ms, queries, status = [], [], 0, None
+    for _ in range(repeat):
+        # Times each query with perf_counter; connection.queries only keeps
+        # milliseconds, which rounds every fast query to zero.
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile):
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        status = response.status_code
+        queries = max(queries, len(profile.queries))
+        sql_ms.append(profile.sql_ms)
+
+    timings.sort()
+    return {
+        'status': status,
+        'queries': queries,
+        'sql_ms': round(statistics.mean(sql_ms), 3),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+    }
+
+
+def load_baselines():
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+def save_baselines(dataset, results):
+    data = {'dataset': dataset, 'routes': results}
+    BASELINE_PATH.write_text(json.dumps(data, indent=2, sort_keys=True) + '\n')
+
+
+def regressions(route, result, baseline, threshold=None):
+    """
+    Return human readable regressions of ``result`` against ``baseline``;
+    timings are only compared when a ``threshold`` is given.
+    """
+    problems = []
+    if result['queries'] > baseline['queries']:
+        problems.append(f"{route}: {result['queries']} queries (baseline {baseline['queries']})")
+    if threshold is None:
+        return problems
+    limit = baseline['p50_ms'] * (1 + threshold) + TIMING_SLACK_MS
+    if result['p50_ms'] > limit:
+        problems.append(f"{route}: p50 {result['p50_ms']}ms (baseline {baseline['p50_ms']}ms, limit {limit:.1f}ms)")
+    return problems
+
+
+def report(results):
+    lines = [f"{'route':<24}{'status':>7}{'queries':>9}{'sql ms':>10}{'p50 ms':>10}{'p95 ms':>10}"]
+    for route, r in results.items():
+        lines.append(
+            f"{route:<24}{r['status']:>7}{r['queries']:>9}{r['sql_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,57 @@
+"""
+Generation counters for versioned cache keys.
+
+Each model the templates cache fragments of has a generation number in the
+cache. Fragment keys include the generations they depend on (and, for per
+post fragments, ``Post.updated_at``), so bumping a generation from a
+``post_save``/``post_delete`` receiver orphans every dependent fragment at
+once without having to know or delete the individual keys.
+"""
+
+import time
+
+from django.core.cache import cache
+
+GENERATION_KEY = 'blog:gen:%s'
+MODELS = ('post', 'comment', 'category', 'ranking')
+
+
+def _seed():
+    # Counters start from the clock so a counter lost to eviction or a
+    # cache flush never comes back at a value an old fragment was keyed on.
+    return time.time_ns() // 1000
+
+
+def get_generations(names=MODELS):
+    """Return ``{name: generation}`` in a single cache round trip"""
+    keys = {GENERATION_KEY % name: name for name in names}
+    values = cache.get_many(keys)
+    for key in keys.keys() - values.keys():
+        cache.add(key, _seed(), timeout=None)
+        values[key] = cache.get(key)
+    # In the order of ``names``: validators hash the result, so it must not
+    # depend on which generations had to be seeded.
+    return {name: values[key] for key, name in keys.items()}
+
+
+def bump(*names):
+    """Invalidate every fragment that depends on the given generations"""
+    for name in names:
+        key = GENERATION_KEY % name
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _seed(), timeout=None)
+
+
+class Generations:
+    """Lazily loaded generations for use as ``{% cache %}`` vary-on values"""
+
+    def __init__(self, names=MODELS):
+        self._names = names
+        self._values = None
+
+    def __getitem__(self, name):
+        if self._values is None:
+            self._values = get_generations(self._names)
+        return self._values[name]
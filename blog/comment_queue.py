@@ -0,0 +1,68 @@
+"""
+Queue for comment submissions.
+
+With ``BLOG_COMMENT_QUEUE = True`` the comment views only insert a
+``CommentSubmission`` row and redirect, so a burst of comments on a
+popular post costs each request one small INSERT and no cache purges.
+``manage.py process_comment_queue`` (run it with ``--loop`` as a worker)
+drains the queue in batches: it moderates each batch as a whole with the
+rules of blog.moderation, writes the comments with one ``bulk_create``
+and purges the cached pages of the affected posts once per batch instead
+of once per comment.
+
+On PostgreSQL several workers can drain the queue at once, since rows are
+claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``; on SQLite run one.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import moderation
+from .cache import bump
+from .models import Comment, CommentSubmission, content_digest
+
+
+def enabled():
+    return getattr(settings, 'BLOG_COMMENT_QUEUE', False)
+
+
+def enqueue(post, author, content):
+    """Queue a comment; it is published by the next process() run"""
+    return CommentSubmission.objects.create(post=post, author=author, content=content)
+
+
+def moderate(submissions):
+    """
+    Unsaved comments for a batch of submissions, moderated together by the
+    rules of blog.moderation: double submissions and deactivated accounts
+    are rejected, suspicious comments held and the rest approved.
+    """
+    comments = [
+        Comment(post_id=s.post_id, author_id=s.author_id, content=s.content, content_hash=content_digest(s.content))
+        for s in submissions
+    ]
+    for comment, status, note in moderation.decide(comments):
+        comment.moderation_status = status
+        comment.moderation_note = note
+        comment.approved = status == Comment.Moderation.APPROVED
+    return comments
+
+
+def process(batch_size=500):
+    """Publish up to ``batch_size`` queued comments; returns how many were taken"""
+    with transaction.atomic():
+        queue = CommentSubmission.objects.all()
+        if connection.features.has_select_for_update_skip_locked:
+            queue = queue.select_for_update(skip_locked=True, of=('self',))
+        submissions = list(queue[:batch_size])
+        if not submissions:
+            return 0
+
+        comments = Comment.objects.bulk_create(moderate(submissions))
+        CommentSubmission.objects.filter(pk__in=[s.pk for s in submissions]).delete()
+
+    # bulk_create sends no signals: purge once for the whole batch.
+    approved = {comment.post_id for comment in comments if comment.approved}
+    if approved:
+        bump('comment', *(f'post:{pk}' for pk in approved))
+    return len(submissions)
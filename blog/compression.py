@@ -0,0 +1,297 @@
+"""
+HTML minification and response compression.
+
+``HTMLMinifyMiddleware`` collapses the whitespace and drops the comments
+the templates leave in rendered HTML. The contents of ``<pre>``,
+``<textarea>``, ``<script>`` and ``<style>`` are left untouched, and runs
+of whitespace become a single space or newline rather than nothing, so
+inline elements keep their spacing. It sits below
+``AnonymousPageCacheMiddleware``, so cached pages are stored minified and
+a cache hit costs no minification at all.
+
+``ResponseCompressionMiddleware`` sits near the top of the stack and
+compresses text responses with brotli (when the ``brotli`` package is
+installed) or gzip, whichever the client's ``Accept-Encoding`` prefers.
+Streaming responses are compressed chunk by chunk and flushed after each
+one, so the client can start parsing before the response is complete.
+
+Compressing a page that reflects user input next to a secret leaks the
+secret through the compressed size (BREACH). As Django's ``GZipMiddleware``
+does, every gzip body gets a random-length file name in its header, up to
+``BLOG_COMPRESSION_MAX_RANDOM_BYTES``, so the size no longer gives the
+secret away. Brotli has no such field, so responses that used a CSRF
+token are always sent gzipped.
+
+Both read their defaults from ``BLOG_HTML_MINIFY``,
+``BLOG_COMPRESSION_GZIP_LEVEL``, ``BLOG_COMPRESSION_BROTLI_QUALITY`` and
+``BLOG_COMPRESSION_MIN_SIZE``. ``BLOG_RESPONSE_ROUTES`` overrides them
+per view name (``'blog:post_detail'``) or per URL namespace
+(``'admin'``); a ``gzip_level`` of 0 turns compression off for a route.
+Pages served by ``AnonymousPageCacheMiddleware`` are never resolved, so
+it records the route of each page it stores and sets it on the request
+on a hit.
+
+The sizes and the time spent on each step are kept on
+``request.response_metrics`` and written to the profiling log by
+``blog.middleware.QueryProfilingMiddleware``, per view. ``manage.py
+benchmark_compression`` compares levels on real pages.
+"""
+
+import re
+import secrets
+import struct
+import time
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Kept verbatim: whitespace in them is significant.
+PRESERVED = re.compile(r'<(pre|textarea|script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+# Conditional comments (<!--[if IE]>) are markup, not commentary.
+COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+# \s would also match non-breaking spaces, which are content.
+NEWLINE_RUN = re.compile(r'[ \t\r\f]*\n[ \t\r\n\f]*')
+SPACE_RUN = re.compile(r'[ \t\r\f]{2,}')
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+DEFAULTS = {
+    'minify': True,
+    'gzip_level': 6,
+    'brotli_quality': 5,
+    'min_size': 512,
+    'max_random_bytes': 100,
+}
+
+
+def route_options(request):
+    """Minification and compression settings for the view serving ``request``"""
+    options = {
+        'minify': getattr(settings, 'BLOG_HTML_MINIFY', DEFAULTS['minify']),
+        'gzip_level': getattr(settings, 'BLOG_COMPRESSION_GZIP_LEVEL', DEFAULTS['gzip_level']),
+        'brotli_quality': getattr(settings, 'BLOG_COMPRESSION_BROTLI_QUALITY', DEFAULTS['brotli_quality']),
+        'min_size': getattr(settings, 'BLOG_COMPRESSION_MIN_SIZE', DEFAULTS['min_size']),
+        'max_random_bytes': getattr(settings, 'BLOG_COMPRESSION_MAX_RANDOM_BYTES', DEFAULTS['max_random_bytes']),
+    }
+    routes = getattr(settings, 'BLOG_RESPONSE_ROUTES', {})
+    route = route_name(request)
+    if routes and route is not None:
+        namespace, view_name = route
+        options.update(routes.get(namespace, {}))
+        options.update(routes.get(view_name, {}))
+    return options
+
+
+def route_name(request):
+    """``(namespace, view_name)`` of the view serving ``request``, or None"""
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        return match.namespace, match.view_name
+    # Set by AnonymousPageCacheMiddleware on a hit, which skips URL resolution
+    return getattr(request, 'page_cache_route', None)
+
+
+def metrics(request):
+    """The ``response_metrics`` dict of ``request``, created on first use"""
+    if not hasattr(request, 'response_metrics'):
+        request.response_metrics = {}
+    return request.response_metrics
+
+
+def _collapse(html):
+    html = COMMENT.sub('', html)
+    html = NEWLINE_RUN.sub('\n', html)
+    return SPACE_RUN.sub(' ', html)
+
+
+def minify_html(html):
+    """``html`` with comments removed and whitespace runs collapsed outside preserved elements"""
+    parts = []
+    position = 0
+    for match in PRESERVED.finditer(html):
+        parts.append(_collapse(html[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(_collapse(html[position:]))
+    return ''.join(parts)
+
+
+class HTMLMinifyMiddleware(MiddlewareMixin):
+    """Minify complete HTML responses; goes below AnonymousPageCacheMiddleware"""
+
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith('text/html')
+            or not route_options(request)['minify']
+        ):
+            return response
+        start = time.perf_counter()
+        try:
+            html = response.content.decode(response.charset)
+        except UnicodeDecodeError:
+            return response
+        response.content = minify_html(html)
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        metrics(request).update({
+            'html_bytes': len(html.encode(response.charset)),
+            'minified_bytes': len(response.content),
+            'minify_ms': round((time.perf_counter() - start) * 1000, 3),
+        })
+        return response
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header, allow_brotli=True):
+    """'br', 'gzip' or None: the best coding both sides support, brotli on ties"""
+    accepted = accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for coding in ('br', 'gzip') if brotli is not None and allow_brotli else ('gzip',):
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def gzip_header(max_random_bytes=0):
+    """A gzip member header, padded with a random-length file name when ``max_random_bytes``"""
+    if not max_random_bytes:
+        return b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+    # FNAME flag; zero mtime, no extra flags, unknown OS
+    name = b'a' * secrets.randbelow(max_random_bytes)
+    return b'\x1f\x8b\x08\x08\x00\x00\x00\x00\x00\xff' + name + b'\x00'
+
+
+class GzipStream:
+    def __init__(self, level, max_random_bytes=0):
+        # Raw deflate data; the header and trailer are written here so the
+        # header can carry the random padding.
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self._header = gzip_header(max_random_bytes)
+        self._crc = 0
+        self._size = 0
+
+    def _compress(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        header, self._header = self._header, b''
+        return header + self._compressor.compress(data)
+
+    def chunk(self, data):
+        """Compressed ``data``, flushed so the client can decode it right away"""
+        return self._compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b''):
+        body = self._compress(data) + self._compressor.flush()
+        return body + struct.pack('<II', self._crc, self._size & 0xFFFFFFFF)
+
+
+class BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data=b''):
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def compressor(coding, options):
+    if coding == 'br':
+        return BrotliStream(options['brotli_quality'])
+    return GzipStream(options['gzip_level'], options.get('max_random_bytes', 0))
+
+
+def _compress_stream(content, stream):
+    for data in content:
+        if data:
+            yield stream.chunk(data)
+    yield stream.finish()
+
+
+async def _acompress_stream(content, stream):
+    async for data in content:
+        if data:
+            yield stream.chunk(data)
+    yield stream.finish()
+
+
+class ResponseCompressionMiddleware(MiddlewareMixin):
+    """
+    Compress text responses with the client's preferred coding; goes above
+    every middleware that reads or rewrites the body.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        options = route_options(request)
+        if not options['gzip_level']:
+            return response
+        if not response.streaming and len(response.content) < options['min_size']:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        # Only gzip can be padded against BREACH; see the module docstring
+        coding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+            allow_brotli=not request.META.get('CSRF_COOKIE_USED'),
+        )
+        if coding is None:
+            return response
+        stream = compressor(coding, options)
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _acompress_stream(response.streaming_content, stream)
+            else:
+                response.streaming_content = _compress_stream(response.streaming_content, stream)
+            del response['Content-Length']
+        else:
+            start = time.perf_counter()
+            compressed = stream.finish(response.content)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+            metrics(request).update({
+                'sent_bytes': len(compressed),
+                'compress_ms': round(elapsed_ms, 3),
+            })
+
+        # The body now differs per coding, so the validator can only be weak.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        metrics(request)['encoding'] = coding
+        return response
@@ -0,0 +1,65 @@
+"""
+Conditional GET support for the post and list pages.
+
+Views build a validator from data they load anyway (or from the cheap
+``blog.cache`` generation counters) before doing the expensive part of
+the request, and return early when the client's ``If-None-Match`` or
+``If-Modified-Since`` still matches:
+
+    validator = conditional.Validator(
+        request, post.updated_at, post.approved_comment_count,
+        last_modified=[post.updated_at],
+    )
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    ...
+    return validator.apply(render(...))
+
+The ETag covers every part given plus the current user, so signing in or
+out changes it. Requests with pending flash messages are never answered
+with 304, since the page would have displayed them.
+"""
+
+import hashlib
+
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def _has_messages(request):
+    if CookieStorage.cookie_name in request.COOKIES:
+        return True
+    session = getattr(request, 'session', None)
+    return bool(session is not None and session.get(SessionStorage.session_key))
+
+
+class Validator:
+    """ETag over ``parts`` and the user; Last-Modified is the newest of ``last_modified``"""
+
+    def __init__(self, request, *parts, last_modified=()):
+        self.request = request
+        user = getattr(request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        digest = hashlib.md5(repr((user_id, parts)).encode(), usedforsecurity=False)
+        self.etag = quote_etag(digest.hexdigest())
+        timestamps = [ts for ts in last_modified if ts is not None]
+        self.last_modified = int(max(timestamps).timestamp()) if timestamps else None
+
+    def not_modified(self):
+        """A 304 (or 412) response if the client's copy is current, else None"""
+        if self.request.method not in ('GET', 'HEAD') or _has_messages(self.request):
+            return None
+        return get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified
+        )
+
+    def apply(self, response):
+        """Set ETag and Last-Modified on a full response"""
+        if response.status_code == 200:
+            response['ETag'] = self.etag
+            if self.last_modified is not None:
+                response['Last-Modified'] = http_date(self.last_modified)
+        return response
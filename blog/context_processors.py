@@ -0,0 +1,11 @@
+from django.conf import settings
+
+from .cache import Generations
+
+
+def fragment_cache(request):
+    """Generation counters and timeout used by the {% cache %} fragments"""
+    return {
+        'cache_generation': Generations(),
+        'fragment_cache_timeout': getattr(settings, 'BLOG_FRAGMENT_CACHE_TIMEOUT', 600),
+    }
@@ -0,0 +1,148 @@
+"""
+Write-behind buffer for post view counts.
+
+Views are recorded with an atomic ``cache.incr`` on a per-post delta key
+instead of an UPDATE on every request. Whenever a post's delta goes from
+0 to 1 its id is written to a journal slot (slots are numbered by another
+atomic counter), so the flusher knows which posts to visit without
+scanning the whole table. Flushing turns the deltas into batched
+``F('view_count') + n`` updates, one UPDATE per distinct delta.
+
+With a shared cache (Redis in production) the buffer is shared by all
+workers and can be flushed by ``manage.py flush_view_counts``. With the
+local-memory cache each process flushes its own buffer opportunistically,
+at most once every ``BLOG_VIEW_COUNT_FLUSH_INTERVAL`` seconds.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+DELTA_KEY = 'blog:views:delta:%d'
+JOURNAL_KEY = 'blog:views:journal:%d'
+SEQUENCE_KEY = 'blog:views:seq'
+FLUSHED_KEY = 'blog:views:flushed'
+STALLED_KEY = 'blog:views:stalled'
+FLUSH_LOCK_KEY = 'blog:views:flush-lock'
+FLUSH_DUE_KEY = 'blog:views:flush-due'
+
+
+def _incr(key, delta=1):
+    """Atomically increment ``key``, creating it first if it is missing."""
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # The key was evicted between add() and incr().
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+
+def _journal(post_id):
+    seq = _incr(SEQUENCE_KEY)
+    cache.set(JOURNAL_KEY % seq, post_id, timeout=None)
+
+
+def record_view(post_id):
+    """Buffer one view of ``post_id``."""
+    if _incr(DELTA_KEY % post_id) == 1:
+        _journal(post_id)
+
+    interval = getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_INTERVAL', 30)
+    if interval and cache.add(FLUSH_DUE_KEY, True, timeout=interval):
+        flush()
+
+
+def pending_views(post_ids):
+    """Return ``{post_id: buffered delta}`` for the given posts."""
+    keys = {DELTA_KEY % pk: pk for pk in post_ids}
+    values = cache.get_many(keys)
+    return {keys[key]: delta for key, delta in values.items() if delta}
+
+
+def attach_pending_views(posts):
+    """Set ``pending_views`` on each post with a single cache round trip."""
+    posts = list(posts)
+    deltas = pending_views(post.pk for post in posts)
+    for post in posts:
+        post.pending_views = deltas.get(post.pk, 0)
+    return posts
+
+
+def _read_journal():
+    """
+    Return the post ids journaled since the last flush and the range of
+    slots they came from. Reading stops at the first missing slot (a
+    writer may be between its incr and set); a slot that is still missing
+    on the next flush is treated as abandoned and skipped.
+    """
+    flushed = cache.get(FLUSHED_KEY, 0)
+    seq = cache.get(SEQUENCE_KEY, 0)
+    slots = range(flushed + 1, seq + 1)
+    journal = cache.get_many([JOURNAL_KEY % slot for slot in slots])
+
+    post_ids = set()
+    last = flushed
+    for slot in slots:
+        post_id = journal.get(JOURNAL_KEY % slot)
+        if post_id is None:
+            if cache.get(STALLED_KEY) != slot:
+                cache.set(STALLED_KEY, slot, timeout=None)
+                break
+        else:
+            post_ids.add(post_id)
+        last = slot
+    return post_ids, range(flushed + 1, last + 1)
+
+
+def flush():
+    """
+    Write buffered deltas to the database. Returns the number of views
+    flushed, or ``None`` if another process is already flushing.
+    """
+    if not cache.add(FLUSH_LOCK_KEY, True, timeout=60):
+        return None
+    try:
+        post_ids, slots = _read_journal()
+        deltas = cache.get_many([DELTA_KEY % pk for pk in post_ids])
+
+        by_delta = defaultdict(list)
+        for pk in post_ids:
+            delta = deltas.get(DELTA_KEY % pk)
+            if delta:
+                by_delta[delta].append(pk)
+
+        if by_delta:
+            from .models import Post
+
+            with transaction.atomic():
+                for delta, pks in by_delta.items():
+                    Post.objects.filter(pk__in=pks).update(
+                        view_count=F('view_count') + delta
+                    )
+
+        # The deltas are in the database now: whatever happens below, the
+        # slots must go, or the next flush would count these posts again.
+        try:
+            for delta, pks in by_delta.items():
+                for pk in pks:
+                    try:
+                        remaining = cache.decr(DELTA_KEY % pk, delta)
+                    except ValueError:
+                        # Evicted since get_many(); views recorded after the
+                        # eviction started a new key and journaled it.
+                        continue
+                    # decr() is atomic, so views recorded since get_many() stay
+                    # in the buffer; re-journal the post so they are not stranded.
+                    if remaining > 0:
+                        _journal(pk)
+        finally:
+            if slots:
+                cache.delete_many([JOURNAL_KEY % slot for slot in slots])
+                cache.set(FLUSHED_KEY, slots[-1], timeout=None)
+        return sum(delta * len(pks) for delta, pks in by_delta.items())
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
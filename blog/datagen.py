@@ -0,0 +1,241 @@
+"""
+Synthetic data generator used by ``populate_blog`` and the route benchmark.
+
+Rows are built lazily and written with ``bulk_create`` in fixed-size
+batches, one transaction per batch, so memory use stays bounded by the
+batch size plus one integer per generated user and post (kept in compact
+``array`` buffers to pick foreign keys from). Text is assembled from a
+pool of pre-generated paragraphs, which keeps generation cheap enough for
+millions of rows while still giving varied, word-like content.
+"""
+
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import related, search
+from .cache import bump
+from .models import Category, Comment, Post, content_digest
+from .rendering import render_excerpt, render_html
+
+VOCABULARY = (
+    'the a an and or but of to in on for with at by from about into over after '
+    'before under between through during without within across against '
+    'we you they it this that these those our your their its '
+    'is are was were be been being have has had do does did can could will would '
+    'should may might must make build write read run test deploy scale measure '
+    'improve learn use need find start keep show try change move add remove '
+    'django python web app application framework server client request response '
+    'page view template model query database index cache session user author '
+    'post comment category search feature project code function class module '
+    'performance latency throughput memory worker process thread connection '
+    'data value result error problem solution idea example guide tutorial '
+    'simple fast slow small large new old good better best common useful '
+    'modern clean quick easy hard real first last next every each many few '
+    'today often always never usually quickly carefully really also just only'
+).split()
+
+FIRST_NAMES = 'Alex Sam Jordan Taylor Morgan Casey Riley Jamie Avery Quinn Drew Rowan'.split()
+TOPICS = (
+    'Technology Programming Python Django Databases Performance DevOps Testing '
+    'Security Design Frontend Backend Cloud Data Careers Tooling Architecture'
+).split()
+
+
+def _sentence(rng):
+    words = rng.choices(VOCABULARY, k=rng.randint(8, 20))
+    return words[0].capitalize() + ' ' + ' '.join(words[1:]) + rng.choice('...!?')
+
+
+def _paragraph(rng):
+    return ' '.join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+
+
+def _title(rng):
+    return ' '.join(rng.choices(VOCABULARY, k=rng.randint(3, 8))).capitalize()
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create keep the created_at/updated_at values we assign.
+
+    This switches ``auto_now``/``auto_now_add`` off on the model fields
+    themselves, i.e. for the whole process until the block exits, so it is
+    not thread-safe: only use it from management commands and tests, never
+    while other threads are saving these models.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Generator:
+    """Generate users, categories, posts and comments in batches"""
+
+    def __init__(self, seed=0, batch_size=1000, days=365, log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.paragraphs = [_paragraph(self.rng) for _ in range(500)]
+        self.user_ids = array('q')
+        self.category_ids = []
+        self.post_ids = array('q')
+        self.new_posts = 0
+
+    def _when(self):
+        return self.now - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def _insert(self, model, objects, label, total):
+        """bulk_create ``objects`` in batches and return their ids"""
+        ids = array('q')
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                ids.extend(self._flush(model, batch))
+                self.log(f'{label}: {len(ids)}/{total}')
+                batch = []
+        if batch:
+            ids.extend(self._flush(model, batch))
+            self.log(f'{label}: {len(ids)}/{total}')
+        return ids
+
+    def _flush(self, model, batch):
+        with transaction.atomic():
+            return [obj.pk for obj in model.objects.bulk_create(batch)]
+
+    def users(self, count):
+        if not count:
+            return
+        start = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        # Hash once: every generated account shares the password "password".
+        password = make_password('password')
+
+        def build():
+            for i in range(start, start + count):
+                yield User(
+                    username=f'user{i}', email=f'user{i}@example.com',
+                    first_name=self.rng.choice(FIRST_NAMES), password=password,
+                    date_joined=self._when(),
+                )
+
+        self.user_ids.extend(self._insert(User, build(), 'users', count))
+
+    def categories(self, count):
+        if not count:
+            return
+        start = (Category.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+        def build():
+            for i in range(start, start + count):
+                name = f'{self.rng.choice(TOPICS)} {i}'
+                yield Category(name=name, slug=slugify(name), description=_sentence(self.rng))
+
+        self.category_ids.extend(self._insert(Category, build(), 'categories', count))
+
+    def posts(self, count):
+        if not count:
+            return
+        if not self.user_ids:
+            self.user_ids.extend(User.objects.values_list('id', flat=True))
+        if not self.user_ids:
+            raise CommandError('Posts need authors: generate users or create some first.')
+        if not self.category_ids:
+            self.category_ids.extend(Category.objects.values_list('id', flat=True))
+        start = (Post.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        rng = self.rng
+
+        def build():
+            for i in range(start, start + count):
+                title = _title(rng)
+                content = '\n\n'.join(rng.sample(self.paragraphs, rng.randint(3, 8)))
+                created = self._when()
+                yield Post(
+                    title=title, slug=f'{slugify(title)[:180]}-{i}', content=content,
+                    excerpt=render_excerpt(content), content_html=render_html(content),
+                    author_id=rng.choice(self.user_ids),
+                    category_id=rng.choice(self.category_ids) if self.category_ids else None,
+                    created_at=created, updated_at=created,
+                    published=rng.random() < 0.9, featured=rng.random() < 0.03,
+                    view_count=min(int(rng.paretovariate(1.2) * 10), 10 ** 6),
+                )
+
+        with explicit_timestamps(Post):
+            self.post_ids.extend(self._insert(Post, build(), 'posts', count))
+        self.new_posts += count
+
+    def comments(self, count):
+        if not count:
+            return
+        if not self.user_ids:
+            self.user_ids.extend(User.objects.values_list('id', flat=True))
+        if not self.post_ids:
+            self.post_ids.extend(Post.objects.values_list('id', flat=True))
+        if not self.user_ids:
+            raise CommandError('Comments need authors: generate users or create some first.')
+        if not self.post_ids:
+            raise CommandError('Comments need posts: generate posts or create some first.')
+        rng = self.rng
+
+        def build():
+            for _ in range(count):
+                created = self._when()
+                content = ' '.join(_sentence(rng) for _ in range(rng.randint(1, 3)))
+                status = Comment.Moderation.APPROVED if rng.random() < 0.9 else Comment.Moderation.REJECTED
+                yield Comment(
+                    post_id=rng.choice(self.post_ids), author_id=rng.choice(self.user_ids),
+                    content=content, content_hash=content_digest(content),
+                    created_at=created, updated_at=created,
+                    moderation_status=status, approved=status == Comment.Moderation.APPROVED,
+                )
+
+        with explicit_timestamps(Comment):
+            self._insert(Comment, build(), 'comments', count)
+
+    def finish(self, indexes=True):
+        """
+        Bring data that bulk_create bypasses (signals) up to date. Only new
+        posts change the search and related-posts indexes and the category
+        counts; with ``indexes=False`` the indexes are left for
+        ``rebuild_search_index`` and ``compute_related`` to build later.
+        """
+        if self.new_posts:
+            if indexes:
+                self.log('Rebuilding the search index...')
+                search.rebuild()
+                self.log('Rebuilding related posts...')
+                related.build()
+            call_command('recount_categories', stdout=StringIO())
+        bump('post', 'comment', 'category')
+
+
+def generate(users=0, categories=0, posts=0, comments=0, seed=0, batch_size=1000, log=None, indexes=True):
+    generator = Generator(seed=seed, batch_size=batch_size, log=log)
+    generator.users(users)
+    generator.categories(categories)
+    generator.posts(posts)
+    generator.comments(comments)
+    generator.finish(indexes=indexes)
+    return generator
@@ -0,0 +1,21 @@
+"""
+Batch commands that start with the lean settings profile (``BLOG_LEAN`` in
+blog_project/settings.py, no admin) and without system checks, which
+import the URLconf and every view. ``manage.py`` reads this before Django
+is set up, so the module must not import Django. Set ``BLOG_LEAN=0`` to
+run them in full. ``delete_user`` is not one of them: deleting a user
+cascades to the admin's LogEntry rows, so it needs the admin installed.
+"""
+
+LEAN_COMMANDS = {
+    'backfill_post_rendering',
+    'compute_rankings',
+    'compute_related',
+    'flush_view_counts',
+    'moderate_comments',
+    'populate_blog',
+    'process_comment_queue',
+    'rebuild_search_index',
+    'recount_categories',
+    'sync_sqlite_replicas',
+}
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored excerpt and HTML of posts from their content'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Posts to update per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--only-missing', action='store_true',
+            help='Only render posts that have no stored excerpt yet',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = Post.objects.only('id', 'content').order_by('pk')
+        if options['only_missing']:
+            posts = posts.filter(excerpt='')
+
+        updated = 0
+        batch = []
+        for post in posts.iterator(chunk_size=batch_size):
+            post.render_content()
+            batch.append(post)
+            if len(batch) == batch_size:
+                updated += self._save(batch)
+                batch = []
+        updated += self._save(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered {updated} posts'))
+
+    def _save(self, batch):
+        # bulk_update leaves updated_at alone, so fragment caches stay warm.
+        with transaction.atomic():
+            Post.objects.bulk_update(batch, ['excerpt', 'content_html'])
+        return len(batch)
@@ -0,0 +1,85 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from blog.compression import GzipStream, brotli, compressor, minify_html
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the main pages and report, per page, the size and CPU cost of '
+        'minifying and of each gzip level and brotli quality'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per step (default: 50)')
+        parser.add_argument(
+            '--gzip-levels', default='1,3,6,9', help='Comma-separated gzip levels (default: 1,3,6,9)'
+        )
+        parser.add_argument(
+            '--brotli-qualities', default='1,4,5,8,11',
+            help='Comma-separated brotli qualities, if brotli is installed (default: 1,4,5,8,11)'
+        )
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['gzip_levels'].split(',')]
+        qualities = [int(quality) for quality in options['brotli_qualities'].split(',')] if brotli else []
+        if brotli is None:
+            self.stderr.write('brotli is not installed; reporting gzip only')
+
+        for page, (view_name, path) in self.pages().items():
+            html = self.render(path)
+            minified, minify_ms = self.timed(lambda: minify_html(html), options['repeat'])
+            raw, small = html.encode(), minified.encode()
+            self.stdout.write(self.style.SUCCESS(f'{page} ({view_name})'))
+            self.stdout.write(f"  {'step':<16}{'bytes':>10}{'ratio':>8}{'ms':>9}")
+            self.row('rendered', len(raw), len(raw), 0.0)
+            self.row('minified', len(small), len(raw), minify_ms)
+            for level in levels:
+                body, ms = self.timed(lambda: GzipStream(level).finish(small), options['repeat'])
+                self.row(f'gzip -{level}', len(body), len(raw), minify_ms + ms)
+            for quality in qualities:
+                body, ms = self.timed(
+                    lambda: compressor('br', {'brotli_quality': quality}).finish(small), options['repeat']
+                )
+                self.row(f'brotli q{quality}', len(body), len(raw), minify_ms + ms)
+        self.stdout.write(
+            'ms is the median CPU time per response, including minification. '
+            'Tune routes with BLOG_RESPONSE_ROUTES.'
+        )
+
+    def pages(self):
+        post = Post.objects.filter(published=True, category__isnull=False).select_related('category').first()
+        if post is None:
+            raise CommandError('No published post with a category found; run populate_blog first')
+        return {
+            'home': ('blog:home', reverse('blog:home')),
+            'post_detail': ('blog:post_detail', post.get_absolute_url()),
+            'category_posts': ('blog:category_posts', reverse('blog:category_posts', args=[post.category.slug])),
+        }
+
+    def render(self, path):
+        # Unminified, uncompressed and not written to the page cache
+        with override_settings(BLOG_HTML_MINIFY=False, BLOG_PAGE_CACHE_TIMEOUT=0):
+            host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+            response = Client(HTTP_HOST=host).get(path)
+        if response.status_code != 200:
+            raise CommandError(f'{path} answered {response.status_code}')
+        return response.content.decode(response.charset)
+
+    def timed(self, step, repeat):
+        """The result of ``step`` and its median duration in ms"""
+        timings = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            result = step()
+            timings.append((time.perf_counter() - start) * 1000)
+        return result, statistics.median(timings)
+
+    def row(self, step, size, raw_size, ms):
+        self.stdout.write(f'  {step:<16}{size:>10}{size / raw_size:>8.2f}{ms:>9.3f}')
@@ -0,0 +1,108 @@
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.urls import reverse
+
+from blog.middleware import connection_stats, install_connection_timer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare home page latency with a new database connection per request, '
+        'persistent connections and (on PostgreSQL with psycopg 3) a connection pool'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Requests per mode (default: 300)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads (default: 4)')
+        parser.add_argument(
+            '--pool-size', type=int, default=2,
+            help='max_size of the pool in pool mode (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        database = connections[DEFAULT_DB_ALIAS].settings_dict
+        modes = {
+            'per-request': {'CONN_MAX_AGE': 0},
+            'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+        }
+        if connections[DEFAULT_DB_ALIAS].vendor == 'postgresql':
+            modes['pool'] = {
+                'CONN_MAX_AGE': 0,
+                'OPTIONS': {**database['OPTIONS'], 'pool': {'min_size': 1, 'max_size': options['pool_size']}},
+            }
+        else:
+            self.stderr.write('Pool mode needs PostgreSQL with psycopg 3; skipping it')
+
+        install_connection_timer()
+        original = dict(database)
+        url = reverse('blog:home')
+        self.stdout.write(f"{'mode':<14}{'p50':>10}{'p95':>10}{'connects':>10}{'connect avg':>13}{'connect max':>13}")
+        try:
+            with override_settings(BLOG_PAGE_CACHE_TIMEOUT=0, ALLOWED_HOSTS=['testserver']):
+                for mode, overrides in modes.items():
+                    self.use(database, {**original, **overrides})
+                    timings = self.run(url, options['requests'], options['concurrency'])
+                    timings.sort()
+                    self.stdout.write(
+                        f"{mode:<14}{statistics.median(timings):>8.2f}ms"
+                        f"{timings[int(len(timings) * 0.95)]:>8.2f}ms"
+                        f"{connection_stats.count:>10}"
+                        f"{connection_stats.mean_ms:>11.2f}ms{connection_stats.max_ms:>11.2f}ms"
+                    )
+        finally:
+            self.use(database, original)
+
+    def use(self, database, settings_dict):
+        """Switch the default connection settings in place and drop the old connections"""
+        connections.close_all()
+        # PostgreSQL keeps pools on the connection class, keyed by alias, and
+        # its pool property only builds one when the alias has none yet.
+        connection = connections[DEFAULT_DB_ALIAS]
+        pool = getattr(connection, '_connection_pools', {}).pop(connection.alias, None)
+        if pool is not None:
+            pool.close()
+        database.clear()
+        database.update(settings_dict)
+
+    def run(self, url, requests, concurrency):
+        # The real WSGI handler, not the test client: the test client keeps
+        # connections open across requests whatever CONN_MAX_AGE says.
+        app = WSGIHandler()
+
+        def get():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': url, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+                'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+                'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+            }
+            response = app(environ, lambda status, headers, exc_info=None: None)
+            b''.join(response)
+            response.close()
+            if response.status_code != 200:
+                raise CommandError(f'home answered {response.status_code}')
+
+        def worker(count):
+            get()  # warm up
+            timings = []
+            for _ in range(count):
+                start = time.perf_counter()
+                get()
+                timings.append((time.perf_counter() - start) * 1000)
+            # Connections are per thread; give them back before the thread exits.
+            connections.close_all()
+            return timings
+
+        connection_stats.reset()
+        shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+        with ThreadPoolExecutor(concurrency) as pool:
+            batches = list(pool.map(worker, shares))
+        return [timing for batch in batches for timing in batch]
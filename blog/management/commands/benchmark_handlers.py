@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import reverse
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of the read-only pages served by the WSGI handler '
+        'with the sync views and by the ASGI handler with the async views'
+    )
+    # URL checks would import the URLconf before --handler picks the views.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per page (default: 500)')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight (default: 16)')
+        parser.add_argument(
+            '--page-cache', action='store_true',
+            help='Keep the anonymous page cache on (by default every request renders)'
+        )
+        parser.add_argument('--handler', choices=['wsgi', 'asgi'], help='Run one handler in this process')
+
+    def handle(self, *args, **options):
+        if options['handler']:
+            overrides = {'BLOG_ASYNC_VIEWS': options['handler'] == 'asgi'}
+            if not options['page_cache']:
+                overrides['BLOG_PAGE_CACHE_TIMEOUT'] = 0
+            with override_settings(**overrides):
+                results = self.run_handler(options['handler'], options['requests'], options['concurrency'])
+            self.stdout.write(json.dumps(results))
+            return
+
+        # Each handler runs in a fresh process, since the URLconf picks
+        # sync or async views once, when it is imported.
+        results = {handler: self.spawn(handler, options) for handler in ('wsgi', 'asgi')}
+        self.stdout.write(f"{'page':<16}{'wsgi req/s':>12}{'asgi req/s':>12}{'wsgi p50':>10}{'asgi p50':>10}")
+        for page in results['wsgi']:
+            wsgi, asgi = results['wsgi'][page], results['asgi'][page]
+            self.stdout.write(
+                f"{page:<16}{wsgi['rps']:>12.1f}{asgi['rps']:>12.1f}"
+                f"{wsgi['p50_ms']:>9.1f}ms{asgi['p50_ms']:>8.1f}ms"
+            )
+
+    def spawn(self, handler, options):
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_handlers', '--handler', handler,
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+        ]
+        if options['page_cache']:
+            command.append('--page-cache')
+        self.stderr.write(f'Benchmarking {handler}...')
+        output = subprocess.run(command, check=True, capture_output=True, text=True, env=os.environ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def pages(self):
+        post = Post.objects.filter(published=True, category__isnull=False).select_related('category').first()
+        if post is None:
+            raise CommandError('No published post with a category found; run populate_blog first')
+        return {
+            'home': reverse('blog:home'),
+            'post_detail': post.get_absolute_url(),
+            'category_posts': reverse('blog:category_posts', args=[post.category.slug]),
+        }
+
+    def run_handler(self, handler, requests, concurrency):
+        pages = self.pages()
+        if handler == 'wsgi':
+            app, run = WSGIHandler(), self.run_wsgi
+        else:
+            app, run = ASGIHandler(), self.run_asgi
+        results = {}
+        for page, path in pages.items():
+            run(app, path, concurrency, concurrency)  # warm up
+            start = time.perf_counter()
+            timings, statuses = run(app, path, requests, concurrency)
+            elapsed = time.perf_counter() - start
+            if statuses != {200}:
+                raise CommandError(f'{page} answered {sorted(statuses)}')
+            results[page] = {
+                'rps': requests / elapsed,
+                'p50_ms': statistics.median(timings) * 1000,
+            }
+        return results
+
+    def run_wsgi(self, app, path, requests, concurrency):
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        lock = threading.Lock()
+        statuses = set()
+
+        def call():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host,
+                'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+                'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+            }
+            start = time.perf_counter()
+            response = app(environ, lambda status, headers, exc_info=None: None)
+            b''.join(response)
+            response.close()
+            with lock:
+                statuses.add(response.status_code)
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            timings = list(pool.map(lambda _: call(), range(requests)))
+        return timings, statuses
+
+    def run_asgi(self, app, path, requests, concurrency):
+        host = (settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost').encode()
+        statuses = set()
+
+        async def call():
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '', 'headers': [(b'host', host)],
+                'client': ('127.0.0.1', 0), 'server': (host.decode(), 80),
+            }
+            disconnected = asyncio.Event()
+            sent_request = False
+
+            async def receive():
+                nonlocal sent_request
+                if not sent_request:
+                    sent_request = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.add(message['status'])
+
+            start = time.perf_counter()
+            await app(scope, receive, send)
+            disconnected.set()
+            return time.perf_counter() - start
+
+        async def worker(count):
+            return [await call() for _ in range(count)]
+
+        async def main():
+            shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+            batches = await asyncio.gather(*(worker(share) for share in shares))
+            return [timing for batch in batches for timing in batch]
+
+        return asyncio.run(main()), statuses
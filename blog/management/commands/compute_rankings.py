@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import rankings
+
+
+class Command(BaseCommand):
+    help = 'Update the materialized trending and popular post rankings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and update every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=300,
+            help='Seconds between updates when running with --loop (default: 300)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            changed = rankings.compute()
+            if changed or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Updated the rankings of {changed} posts')
+                )
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import related
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related posts of every published post from content similarity'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Posts scored at once with NumPy (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        lists = related.build(batch_size=options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored related posts for {lists} posts in {time.perf_counter() - start:.1f}s'
+        ))
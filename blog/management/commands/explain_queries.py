@@ -0,0 +1,144 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog import search
+from blog.models import Post
+from blog.pagination import encode_cursor
+
+# Tables that are expected to be read in full: the category sidebar lists
+# every category.
+ALLOWED_SCANS = {'blog_category'}
+
+# A private, empty cache so fragment and page caches cannot hide queries.
+EXPLAIN_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blog-explain-queries',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the queries behind each blog view and report sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Print the plan of every query, not just the ones that scan'
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Exit with an error if any sequential scan is found (for CI)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'EXPLAIN parsing is not supported on {connection.vendor}')
+
+        post = Post.objects.filter(
+            published=True, category__isnull=False
+        ).select_related('author', 'category').first()
+        if post is None:
+            raise CommandError('No published post with a category found; run populate_blog first')
+
+        # Run the one-off search index introspection before capturing.
+        search.backend()
+
+        scans = 0
+        with override_settings(
+            CACHES=EXPLAIN_CACHES, ALLOWED_HOSTS=['testserver'], BLOG_VIEW_COUNT_FLUSH_INTERVAL=0
+        ):
+            # Sessions created by force_login are rolled back with the rest.
+            with transaction.atomic():
+                for name, user, url in self.routes(post):
+                    scans += self.explain_route(name, user, url, options['plans'])
+                transaction.set_rollback(True)
+
+        if scans:
+            message = f'{scans} queries scan a table sequentially'
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No sequential scans found'))
+
+    def routes(self, post):
+        """GET routes to check, as ``(name, user, url)``"""
+        home = reverse('blog:home')
+        deep = Post.objects.filter(published=True).order_by('-created_at', '-id')[59:60].first() or post
+        return [
+            ('home', None, home),
+            ('home_next_page', None, home + '?cursor=' + encode_cursor('next', 11, deep)),
+            ('home_search', None, home + '?search=django'),
+            ('post_detail', None, post.get_absolute_url()),
+            ('category_posts', None, reverse('blog:category_posts', args=[post.category.slug])),
+            ('my_posts', post.author, reverse('blog:my_posts')),
+            ('post_edit', post.author, reverse('blog:post_edit', args=[post.slug])),
+        ]
+
+    def explain_route(self, name, user, url, show_plans):
+        cache.clear()
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        if response.status_code >= 400:
+            self.stdout.write(self.style.ERROR(f'{name}: {url} returned {response.status_code}'))
+
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].lstrip().upper().startswith('SELECT')]
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{name} ({len(selects)} queries)'))
+        scans = 0
+        for sql in selects:
+            plan, scanned = self.explain(sql)
+            scanned -= ALLOWED_SCANS
+            if scanned:
+                scans += 1
+                self.stdout.write(self.style.WARNING(f'  sequential scan on {", ".join(sorted(scanned))}'))
+            if scanned or show_plans:
+                self.stdout.write(f'  {sql}')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+        return scans
+
+    def explain(self, sql):
+        """Return the plan as lines of text and the tables read sequentially"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                details = [row[-1] for row in cursor.fetchall()]
+                # "SCAN t" reads the table; "SCAN t USING INDEX i" walks an
+                # index and "SEARCH t ..." seeks one.
+                scanned = {
+                    detail.split()[1] for detail in details
+                    if detail.startswith('SCAN ') and len(detail.split()) == 2
+                }
+                return details, scanned
+
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            lines, scanned = [], set()
+            self._walk(plan[0]['Plan'], 0, lines, scanned)
+            return lines, scanned
+
+    def _walk(self, node, depth, lines, scanned):
+        relation = node.get('Relation Name')
+        index = node.get('Index Name')
+        label = node['Node Type']
+        if relation:
+            label += f' on {relation}'
+        if index:
+            label += f' using {index}'
+        lines.append('  ' * depth + f"{label} (rows={node.get('Plan Rows')})")
+        if node['Node Type'] == 'Seq Scan':
+            scanned.add(relation)
+        for child in node.get('Plans', []):
+            self._walk(child, depth + 1, lines, scanned)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import counters
+
+
+class Command(BaseCommand):
+    help = 'Write buffered post view counts to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running and flush every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=10,
+            help='Seconds between flushes when running with --loop (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = counters.flush()
+            if flushed is None:
+                self.stdout.write('Another flush is in progress, skipping')
+            elif flushed or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Flushed {flushed} buffered views')
+                )
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
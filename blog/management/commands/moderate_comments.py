@@ -0,0 +1,47 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from blog import moderation
+
+OUTCOMES = (moderation.Moderation.APPROVED, moderation.Moderation.HELD, moderation.Moderation.REJECTED)
+
+
+class Command(BaseCommand):
+    help = 'Approve, hold or reject pending comments in batches with the moderation rules'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running, polling every --interval seconds when nothing is pending',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='Seconds to wait when nothing is pending, with --loop (default: 1)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Comments per batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            outcomes = Counter()
+            start = time.perf_counter()
+            while True:
+                batch = moderation.moderate_pending(options['batch_size'])
+                outcomes += batch
+                if batch.total() < options['batch_size']:
+                    break
+            elapsed = time.perf_counter() - start
+
+            total = outcomes.total()
+            if total or not options['loop']:
+                summary = ', '.join(f'{outcomes[status]} {status}' for status in OUTCOMES)
+                self.stdout.write(self.style.SUCCESS(
+                    f'Moderated {total} comments in {elapsed:.2f}s ({total / elapsed:.0f}/s): {summary}'
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
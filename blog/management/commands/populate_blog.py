@@ -1,12 +1,40 @@
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
+from blog.datagen import generate
 from blog.models import Category, Post, Comment
 
 
 class Command(BaseCommand):
-    help = 'Populate the blog with sample data'
+    help = (
+        'Populate the blog with sample data, or with large amounts of '
+        'synthetic data when any of --users/--categories/--posts/--comments is given'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=0, help='Synthetic users to create')
+        parser.add_argument('--categories', type=int, default=0, help='Synthetic categories to create')
+        parser.add_argument('--posts', type=int, default=0, help='Synthetic posts to create')
+        parser.add_argument('--comments', type=int, default=0, help='Synthetic comments to create')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for reproducible data (default: 0)')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows per bulk insert and transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--skip-indexes', action='store_true',
+            help=(
+                'Do not rebuild the search and related-posts indexes after generating posts; '
+                'run rebuild_search_index and compute_related later'
+            ),
+        )
 
     def handle(self, *args, **options):
+        counts = {name: options[name] for name in ('users', 'categories', 'posts', 'comments')}
+        if any(counts.values()):
+            return self.generate(counts, options)
+
         self.stdout.write('Creating sample data...')
 
         # Create categories
@@ -249,6 +277,7 @@ As developers, staying current with these trends and learning new technologies w
                     post=post,
                     author=comment_data['author'],
                     content=comment_data['content'],
+                    defaults={'moderation_status': Comment.Moderation.APPROVED},
                 )
                 if created:
                     self.stdout.write(f'Created comment for: {post.title}')
@@ -258,3 +287,30 @@ As developers, staying current with these trends and learning new technologies w
         self.stdout.write(
             self.style.SUCCESS('Successfully populated the blog with sample data!')
         )
+
+    def generate(self, counts, options):
+        """Bulk-generate synthetic data for load testing"""
+        if any(count < 0 for count in counts.values()):
+            raise CommandError('Counts must not be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if counts['posts'] and not (counts['users'] or User.objects.exists()):
+            raise CommandError('Posts need authors: pass --users or create users first.')
+        if counts['comments'] and not (counts['posts'] or Post.objects.exists()):
+            raise CommandError('Comments need posts: pass --posts or create posts first.')
+        if counts['comments'] and not (counts['users'] or User.objects.exists()):
+            raise CommandError('Comments need authors: pass --users or create users first.')
+
+        started = time.monotonic()
+        generate(
+            seed=options['seed'], batch_size=options['batch_size'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+            indexes=not options['skip_indexes'],
+            **counts,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Generated {users} users, {categories} categories, {posts} posts and '
+            '{comments} comments in {elapsed:.1f}s'.format(
+                elapsed=time.monotonic() - started, **counts
+            )
+        ))
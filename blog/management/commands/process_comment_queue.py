@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog import comment_queue
+
+
+class Command(BaseCommand):
+    help = 'Publish queued comment submissions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running, polling every --interval seconds when the queue is empty',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='Seconds to wait when the queue is empty, with --loop (default: 1)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Submissions per batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = 0
+            while True:
+                taken = comment_queue.process(options['batch_size'])
+                processed += taken
+                if taken < options['batch_size']:
+                    break
+
+            if processed or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Processed {processed} queued comments')
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
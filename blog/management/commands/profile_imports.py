@@ -0,0 +1,135 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management import get_commands
+from django.core.management.base import BaseCommand, CommandError
+from blog.lean import LEAN_COMMANDS
+
+TARGETS = {
+    'setup': 'import django; django.setup()',
+    'wsgi': 'import blog_project.wsgi',
+}
+# What manage.py does before handle(): load the command, then run the
+# system checks unless the lean profile skips them.
+COMMAND_SNIPPET = (
+    'import django; django.setup()\n'
+    'from django.core.management import get_commands, load_command_class\n'
+    'load_command_class(get_commands()[{name!r}], {name!r})\n'
+    'if {checks!r}:\n'
+    '    from django.core import checks; checks.run_checks()'
+)
+
+
+def parse_importtime(stderr):
+    """``[(module, self_us, cumulative_us)]`` from ``python -X importtime`` output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def group(module, depth):
+    return '.'.join(module.split('.')[:depth])
+
+
+class Command(BaseCommand):
+    help = (
+        'Break down the start-up import time of django.setup(), the WSGI application '
+        'or a management command per module and package; --compare times the full '
+        'and lean (BLOG_LEAN=1) settings profiles'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', default='setup',
+            help="'setup', 'wsgi' or the name of a management command (default: setup)"
+        )
+        parser.add_argument('--lean', action='store_true', help='Profile with the lean settings profile')
+        parser.add_argument('--top', type=int, default=20, help='Modules and packages to list (default: 20)')
+        parser.add_argument(
+            '--depth', type=int, default=3,
+            help='Dotted components that make up a package, e.g. 3 for django.contrib.admin (default: 3)'
+        )
+        parser.add_argument('--compare', action='store_true', help='Time full and lean start-up instead')
+        parser.add_argument('--runs', type=int, default=15, help='Processes per measurement (default: 15)')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            self.compare(options['target'], options['runs'])
+        else:
+            self.breakdown(options['target'], options['lean'], options['top'], options['depth'])
+
+    def snippet(self, target, lean):
+        if target in TARGETS:
+            return TARGETS[target]
+        if target not in get_commands():
+            raise CommandError(f"Unknown target {target!r}: use 'setup', 'wsgi' or a command name")
+        return COMMAND_SNIPPET.format(name=target, checks=not (lean and target in LEAN_COMMANDS))
+
+    def environ(self, lean):
+        return {**os.environ, 'BLOG_LEAN': '1' if lean else '0'}
+
+    def breakdown(self, target, lean, top, depth):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', self.snippet(target, lean)],
+            capture_output=True, text=True, env=self.environ(lean), cwd=settings.BASE_DIR,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        modules = parse_importtime(result.stderr)
+        total_us = sum(self_us for _, self_us, _ in modules)
+
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[group(name, depth)] += self_us
+
+        profile = 'lean' if lean else 'full'
+        self.stdout.write(self.style.SUCCESS(
+            f'{target} ({profile} profile): {len(modules)} modules imported in {total_us / 1000:.1f}ms'
+        ))
+        self.stdout.write(f"\n{'package':<48}{'ms':>9}{'share':>8}")
+        for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'{name:<48}{self_us / 1000:>9.1f}{self_us / total_us:>8.1%}')
+        self.stdout.write(f"\n{'module':<48}{'self ms':>9}{'cumul ms':>10}")
+        for name, self_us, cumulative_us in sorted(modules, key=lambda module: -module[1])[:top]:
+            self.stdout.write(f'{name:<48}{self_us / 1000:>9.1f}{cumulative_us / 1000:>10.1f}')
+        self.stdout.write(
+            '\nTimes include the overhead of -X importtime; compare them with each other, '
+            'and use --compare for wall-clock start-up.'
+        )
+
+    def timed(self, command, environ):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True, env=environ, cwd=settings.BASE_DIR)
+        return (time.perf_counter() - start) * 1000
+
+    def compare(self, target, runs):
+        label = target if target in TARGETS else f'manage.py {target}'
+        commands = {
+            'python -c pass': ([sys.executable, '-c', 'pass'], os.environ),
+            f'{label} (full)': ([sys.executable, '-c', self.snippet(target, False)], self.environ(False)),
+            f'{label} (lean)': ([sys.executable, '-c', self.snippet(target, True)], self.environ(True)),
+        }
+        # Interleaved, so background load affects every variant alike
+        timings = defaultdict(list)
+        for _ in range(runs):
+            for name, (command, environ) in commands.items():
+                timings[name].append(self.timed(command, environ))
+        medians = {name: statistics.median(values) for name, values in timings.items()}
+
+        self.stdout.write(f"{'start-up':<40}{'median ms':>10}")
+        for name, ms in medians.items():
+            self.stdout.write(f'{name:<40}{ms:>10.1f}')
+        full, lean = medians[f'{label} (full)'], medians[f'{label} (lean)']
+        self.stdout.write(self.style.SUCCESS(f'Lean profile saves {full - lean:.1f}ms ({(full - lean) / full:.0%})'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from blog import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database alias to reindex (default: "default")',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if search.backend(using) is None:
+            self.stdout.write(
+                self.style.WARNING('No search index on this database; searches use icontains')
+            )
+            return
+
+        with transaction.atomic(using=using):
+            count = search.rebuild(using=using)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} posts'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from blog.models import Category, Post
+
+
+class Command(BaseCommand):
+    help = 'Recompute the published post counters shown in the category sidebar'
+
+    def handle(self, *args, **options):
+        counts = Post.objects.filter(
+            category=OuterRef('pk'), published=True
+        ).order_by().values('category').annotate(total=Count('id')).values('total')
+        updated = Category.objects.update(
+            published_post_count=Coalesce(Subquery(counts), 0)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Recounted posts for {updated} categories')
+        )
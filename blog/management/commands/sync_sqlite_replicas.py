@@ -0,0 +1,37 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from blog.routers import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the SQLite primary database into the SQLite read replicas, '
+        'standing in for replication when trying replica routing locally'
+    )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        aliases = replicas()
+        if not aliases:
+            raise CommandError('BLOG_READ_REPLICAS is empty; set BLOG_SQLITE_REPLICA first')
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite primaries can be copied; real replicas use replication')
+
+        source = sqlite3.connect(primary.settings_dict['NAME'])
+        try:
+            for alias in aliases:
+                replica = connections[alias]
+                if replica.vendor != 'sqlite':
+                    raise CommandError(f'{alias} is not an SQLite database')
+                replica.close()
+                target = sqlite3.connect(replica.settings_dict['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f'Copied the primary into {alias}'))
+        finally:
+            source.close()
@@ -0,0 +1,118 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import reverse
+
+from blog.models import Post
+from blog.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Compile the blog templates and prime the URL resolver and model metadata, '
+        'as gunicorn workers do at boot; --compare reports first-request latency '
+        'of cold and warmed-up processes'
+    )
+    # System checks import the URLconf and would warm up the cold runs.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Time the first request of fresh processes with and without the warm-up'
+        )
+        parser.add_argument('--runs', type=int, default=5, help='Processes per page and mode (default: 5)')
+        parser.add_argument('--first-request', metavar='PATH', help='Time the first request to PATH in this process')
+        parser.add_argument('--cold', action='store_true', help='With --first-request, skip the warm-up')
+
+    def handle(self, *args, **options):
+        if options['first_request']:
+            self.stdout.write(json.dumps(self.first_request(options['first_request'], warm=not options['cold'])))
+            return
+        if options['compare']:
+            self.compare(options['runs'])
+            return
+
+        total = 0.0
+        for name, items, ms in warm_up():
+            total += ms
+            self.stdout.write(f'{name:<12}{items:>6} items{ms:>10.1f}ms')
+        self.stdout.write(self.style.SUCCESS(f'Warmed up in {total:.1f}ms'))
+
+    def first_request(self, path, warm):
+        warmup_ms = 0.0
+        if warm:
+            warmup_ms = sum(ms for _, _, ms in warm_up())
+        # Every request renders, as it would before the page cache fills
+        with override_settings(BLOG_PAGE_CACHE_TIMEOUT=0):
+            app = WSGIHandler()
+            first_ms = self.request(app, path)
+            second_ms = self.request(app, path)
+        return {'warmup_ms': warmup_ms, 'first_ms': first_ms, 'second_ms': second_ms}
+
+    def request(self, app, path):
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host,
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+        }
+        start = time.perf_counter()
+        response = app(environ, lambda status, headers, exc_info=None: None)
+        b''.join(response)
+        response.close()
+        if response.status_code != 200:
+            raise CommandError(f'{path} answered {response.status_code}')
+        return (time.perf_counter() - start) * 1000
+
+    def spawn(self, path, warm):
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'warmup', '--first-request', path]
+        if not warm:
+            command.append('--cold')
+        output = subprocess.run(command, check=True, capture_output=True, text=True, env=os.environ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def compare(self, runs):
+        post = Post.objects.filter(published=True, category__isnull=False).select_related('category').first()
+        if post is None:
+            raise CommandError('No published post with a category found; run populate_blog first')
+        pages = {
+            'home': reverse('blog:home'),
+            'post_detail': post.get_absolute_url(),
+            'category_posts': reverse('blog:category_posts', args=[post.category.slug]),
+        }
+
+        self.stdout.write(f"{'page':<16}{'cold 1st':>10}{'warm 1st':>10}{'warm-up':>10}{'2nd':>10}")
+        for page, path in pages.items():
+            self.stderr.write(f'Measuring {page}...')
+            # A throwaway run, so both modes find the OS and database page
+            # caches warm. Django's cache only carries over to later
+            # processes with a shared backend such as Redis; the default
+            # LocMem cache starts empty in every process.
+            self.spawn(path, warm=True)
+            cold, warm = [], []
+            for _ in range(runs):
+                cold.append(self.spawn(path, warm=False))
+                warm.append(self.spawn(path, warm=True))
+
+            def median(results, key):
+                return statistics.median(result[key] for result in results)
+
+            self.stdout.write(
+                f"{page:<16}{median(cold, 'first_ms'):>8.1f}ms{median(warm, 'first_ms'):>8.1f}ms"
+                f"{median(warm, 'warmup_ms'):>8.1f}ms{median(cold + warm, 'second_ms'):>8.1f}ms"
+            )
+        self.stdout.write(
+            'Medians over fresh processes. "warm 1st" is what visitors see from a worker '
+            'that ran the warm-up at boot; the warm-up itself runs before it accepts requests.'
+        )
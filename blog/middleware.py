@@ -0,0 +1,248 @@
+"""
+Per-request profiling for production.
+
+``QueryProfilingMiddleware`` records, for a sampled share of requests, the
+number of SQL queries and the time spent in them, queries repeated with
+the same shape (the N+1 pattern) and the time spent rendering templates.
+Every profiled request is logged as one JSON line on ``blog.profiling``;
+requests slower than ``BLOG_PROFILING_SLOW_MS`` are also logged on
+``blog.profiling.slow`` with each query and the line of project code that
+issued it. The time spent getting database connections (opening one, or
+waiting for one from a psycopg pool) is logged as ``connect_ms``, with the
+pool's occupancy when pooling is on. Response sizes before and after
+minification and compression, and the time spent on each, are logged as
+``response`` (see ``blog.compression``).
+
+``BLOG_PROFILING_SAMPLE_RATE`` is the fraction of requests to profile
+(1.0 profiles every request). At 0, the default, the middleware removes
+itself from the stack at startup and costs nothing.
+"""
+
+import functools
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.template.backends.django import Template
+
+logger = logging.getLogger('blog.profiling')
+slow_logger = logging.getLogger('blog.profiling.slow')
+
+PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+THIS_FILE = str(Path(__file__).resolve())
+
+# "IN (%s, %s, %s)" and "IN (%s)" share a fingerprint.
+PLACEHOLDER_LIST = re.compile(r'\(%s(?:\s*,\s*%s)*\)')
+
+# Longest SQL string written to the logs.
+MAX_SQL_LENGTH = 500
+
+_current = ContextVar('blog_request_profile', default=None)
+
+
+def fingerprint(sql):
+    """The shape of a parameterised query, ignoring the length of IN lists"""
+    return PLACEHOLDER_LIST.sub('(%s, ...)', sql)
+
+
+def caller():
+    """``file:line in function`` of the innermost project frame outside this module"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_DIR) and filename != THIS_FILE and 'site-packages' not in filename:
+            return f'{filename[len(PROJECT_DIR) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class RequestProfile:
+    """Queries and template renders of one request; also an execute_wrapper"""
+
+    def __init__(self):
+        self.queries = []
+        self.templates = []
+        self.template_ms = 0.0
+        self.connect_ms = 0.0
+        self.connects = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - start) * 1000, caller()))
+
+    @property
+    def sql_ms(self):
+        return sum(ms for _, ms, _ in self.queries)
+
+    def duplicates(self, limit=5):
+        """Query shapes run more than once, most repeated first"""
+        counts = Counter(fingerprint(sql) for sql, _, _ in self.queries)
+        locations = {}
+        for sql, _, location in self.queries:
+            locations.setdefault(fingerprint(sql), location)
+        return [
+            {'count': count, 'sql': shape[:MAX_SQL_LENGTH], 'location': locations[shape]}
+            for shape, count in counts.most_common(limit) if count > 1
+        ]
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def wrapper(self, *args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_ms += (time.perf_counter() - start) * 1000
+            profile.templates.append(self.origin.template_name)
+
+    wrapper.timed = True
+    return wrapper
+
+
+def install_template_timer():
+    """Time top-level template renders of profiled requests (includes run inside them)"""
+    if not getattr(Template.render, 'timed', False):
+        Template.render = _timed_render(Template.render)
+
+
+class ConnectionStats:
+    """Connections opened or checked out by this process and the time it took"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.count = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+
+    def add(self, ms):
+        with self.lock:
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+
+connection_stats = ConnectionStats()
+
+
+def _timed_connect(connect):
+    @functools.wraps(connect)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return connect(self, *args, **kwargs)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            connection_stats.add(ms)
+            profile = _current.get()
+            if profile is not None:
+                profile.connect_ms += ms
+                profile.connects += 1
+
+    wrapper.timed = True
+    return wrapper
+
+
+def install_connection_timer():
+    """Time every database connect, including waits for a pooled connection"""
+    if not getattr(BaseDatabaseWrapper.connect, 'timed', False):
+        BaseDatabaseWrapper.connect = _timed_connect(BaseDatabaseWrapper.connect)
+
+
+def pool_stats():
+    """Occupancy of the psycopg pools of this process, by alias"""
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            current = pool.get_stats()
+            stats[alias] = {
+                key: current.get(key, 0)
+                for key in ('pool_size', 'pool_available', 'requests_waiting')
+            }
+    return stats
+
+
+class QueryProfilingMiddleware:
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'BLOG_PROFILING_SAMPLE_RATE', 0)
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.slow_ms = getattr(settings, 'BLOG_PROFILING_SLOW_MS', 500)
+        self.get_response = get_response
+        install_template_timer()
+        install_connection_timer()
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.report(request, response, profile, (time.perf_counter() - start) * 1000)
+        return response
+
+    def report(self, request, response, profile, duration_ms):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'queries': len(profile.queries),
+            'sql_ms': round(profile.sql_ms, 2),
+            'template_ms': round(profile.template_ms, 2),
+            'templates': profile.templates,
+            'connects': profile.connects,
+            'connect_ms': round(profile.connect_ms, 2),
+            'duplicates': profile.duplicates(),
+        }
+        pools = pool_stats()
+        if pools:
+            record['pools'] = pools
+        response_metrics = getattr(request, 'response_metrics', None)
+        if response_metrics:
+            record['response'] = response_metrics
+        logger.info(json.dumps(record))
+
+        if duration_ms >= self.slow_ms:
+            record['query_log'] = [
+                {'ms': round(ms, 2), 'sql': sql[:MAX_SQL_LENGTH], 'location': location}
+                for sql, ms, location in profile.queries
+            ]
+            slow_logger.warning(json.dumps(record))
@@ -0,0 +1,62 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE blog_post_fts USING fts5("
+    "title, content, author, tokenize='porter unicode61')"
+)
+SQLITE_POPULATE = (
+    "INSERT INTO blog_post_fts (rowid, title, content, author) "
+    "SELECT p.id, p.title, p.content, u.username "
+    "FROM blog_post p INNER JOIN auth_user u ON u.id = p.author_id"
+)
+
+POSTGRES_CREATE = [
+    "CREATE TABLE blog_post_search ("
+    "post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX blog_post_search_document_gin ON blog_post_search USING GIN (document)",
+]
+POSTGRES_POPULATE = (
+    "INSERT INTO blog_post_search (post_id, document) "
+    "SELECT p.id, "
+    "setweight(to_tsvector('english', coalesce(p.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(p.content, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(u.username, '')), 'A') "
+    "FROM blog_post p INNER JOIN auth_user u ON u.id = p.author_id"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(SQLITE_CREATE)
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to icontains.
+            return
+        schema_editor.execute(SQLITE_POPULATE)
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_CREATE:
+            schema_editor.execute(statement)
+        schema_editor.execute(POSTGRES_POPULATE)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS blog_post_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS blog_post_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_published_posts(apps, schema_editor):
+    Category = apps.get_model('blog', 'Category')
+    Post = apps.get_model('blog', 'Post')
+    counts = Post.objects.filter(
+        category=OuterRef('pk'), published=True
+    ).order_by().values('category').annotate(total=Count('id')).values('total')
+    Category.objects.using(schema_editor.connection.alias).update(
+        published_post_count=Coalesce(Subquery(counts), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_published_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:50
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+
+# Frozen copies of blog.rendering as of this migration
+def render_excerpt(content):
+    return Truncator(content).words(30, truncate=' …')
+
+
+def render_html(content):
+    return linebreaks(content, autoescape=True)
+
+
+def render_existing_posts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    posts = Post.objects.using(schema_editor.connection.alias).only('id', 'content')
+    batch = []
+    for post in posts.iterator(chunk_size=500):
+        post.excerpt = render_excerpt(post.content)
+        post.content_html = render_html(post.content)
+        batch.append(post)
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ['excerpt', 'content_html'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt', 'content_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_category_published_post_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
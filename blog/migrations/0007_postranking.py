@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_commentsubmission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRanking',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='blog.post')),
+                ('trending_score', models.FloatField()),
+                ('popular_score', models.PositiveIntegerField(default=0)),
+                ('views_seen', models.PositiveIntegerField(default=0)),
+                ('comments_seen', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-trending_score'], name='ranking_trending_idx'), models.Index(fields=['-popular_score'], name='ranking_popular_idx')],
+            },
+        ),
+    ]
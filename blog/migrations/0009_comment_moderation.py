@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+import hashlib
+from itertools import islice
+
+from django.db import migrations, models
+
+
+def content_digest(text):
+    # Frozen copy of blog.models.content_digest as of this migration
+    return hashlib.sha1(' '.join(text.lower().split()).encode(), usedforsecurity=False).hexdigest()
+
+
+def moderate_existing_comments(apps, schema_editor):
+    Comment = apps.get_model('blog', 'Comment')
+    comments = Comment.objects.using(schema_editor.connection.alias)
+    # Comments posted so far were either published or hidden by a moderator
+    comments.filter(approved=True).update(moderation_status='approved')
+    comments.filter(approved=False).update(moderation_status='rejected')
+    # One prepared UPDATE per row: bulk_update's CASE expressions are far
+    # slower on large comment tables.
+    sql = 'UPDATE {} SET content_hash = %s WHERE id = %s'.format(
+        schema_editor.quote_name(Comment._meta.db_table)
+    )
+    rows = comments.order_by('pk').values_list('content', 'pk').iterator(chunk_size=2000)
+    with schema_editor.connection.cursor() as cursor:
+        while batch := [(content_digest(content), pk) for content, pk in islice(rows, 2000)]:
+            cursor.executemany(sql, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_related_posts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='moderation_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('held', 'Held for review'), ('rejected', 'Rejected')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='moderation_note',
+            field=models.CharField(blank=True, help_text='Rules that scored the comment', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='content_hash',
+            field=models.CharField(default='', editable=False, max_length=40),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='approved',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(moderate_existing_comments, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('moderation_status', 'pending')), fields=['id'], name='comment_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['content_hash'], name='comment_content_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['author', 'created_at'], name='comment_author_recent_idx'),
+        ),
+    ]
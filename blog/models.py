@@ -1,14 +1,22 @@
+import hashlib
+
 from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.urls import reverse
 
+from .rendering import render_excerpt, render_html
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by the Post signal receivers in blog.signals
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = "categories"
@@ -23,11 +31,58 @@ class Category(models.Model):
         super().save(*args, **kwargs)
 
 
+def _count_subquery(queryset, field):
+    """Correlated COUNT(*) of ``queryset`` rows grouped by ``field``"""
+    counts = queryset.order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+class PostQuerySet(models.QuerySet):
+    def with_comment_counts(self):
+        """Annotate approved and awaiting-moderation comment counts without joining comments"""
+        comments = Comment.objects.filter(post=OuterRef('pk'))
+        return self.annotate(
+            approved_comment_count=_count_subquery(comments.filter(approved=True), 'post'),
+            pending_comment_count=_count_subquery(
+                comments.filter(moderation_status__in=[Comment.Moderation.PENDING, Comment.Moderation.HELD]), 'post'
+            ),
+        )
+
+    def author_stats(self, author):
+        """Dashboard totals for one author, computed in a single query"""
+        return self.filter(author=author).order_by().aggregate(
+            total_posts=Count('pk'),
+            published_posts=Count('pk', filter=Q(published=True)),
+            total_views=Coalesce(Sum('view_count'), 0),
+            total_comments=Coalesce(Sum(_count_subquery(
+                Comment.objects.filter(post=OuterRef('pk')), 'post'
+            )), 0),
+        )
+
+    def with_detail_stats(self):
+        """
+        Join author/category and annotate the approved comment count, the
+        newest approved comment change and the author's post count, all in
+        the same query
+        """
+        approved = Comment.objects.filter(post=OuterRef('pk'), approved=True)
+        return self.select_related('author', 'category').annotate(
+            approved_comment_count=_count_subquery(approved, 'post'),
+            last_comment_at=Subquery(approved.order_by('-updated_at').values('updated_at')[:1]),
+            author_post_count=_count_subquery(
+                Post.objects.filter(author=OuterRef('author')), 'author'
+            ),
+        )
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_posts')
     content = models.TextField()
+    # Rendered from content on save, see blog.rendering
+    excerpt = models.TextField(blank=True, editable=False)
+    content_html = models.TextField(blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='posts')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -35,8 +90,27 @@ class Post(models.Model):
     featured = models.BooleanField(default=False)
     view_count = models.PositiveIntegerField(default=0)
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        # One index per list query shape; the partial ones only cover
+        # published posts, which is all the public pages ever read.
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], condition=Q(published=True),
+                name='post_published_recent_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'], condition=Q(published=True),
+                name='post_category_recent_idx',
+            ),
+            models.Index(
+                fields=['-created_at'], condition=Q(published=True, featured=True),
+                name='post_featured_recent_idx',
+            ),
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_recent_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -44,22 +118,172 @@ class Post(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'excerpt', 'content_html'}
         super().save(*args, **kwargs)
 
+    def render_content(self):
+        """Refresh the stored excerpt and HTML from content"""
+        self.excerpt = render_excerpt(self.content)
+        self.content_html = render_html(self.content)
+
     def get_absolute_url(self):
         return reverse('blog:post_detail', kwargs={'slug': self.slug})
 
+    @property
+    def total_views(self):
+        """Stored view count plus views still waiting in the counter buffer"""
+        if not hasattr(self, 'pending_views'):
+            from .counters import pending_views
+            self.pending_views = pending_views([self.pk]).get(self.pk, 0)
+        return self.view_count + self.pending_views
+
+    @property
+    def view_bucket(self):
+        """
+        ``total_views`` rounded down to two significant digits. Cached
+        post cards show it (as "1200+ views") and are keyed on it, so they
+        are re-rendered as a post gains views without missing on every view.
+        """
+        total = self.total_views
+        scale = 10 ** max(len(str(total)) - 2, 0)
+        return total // scale * scale
+
+
+def content_digest(text):
+    """SHA-1 of ``text`` ignoring case and whitespace, to spot repeated comments"""
+    return hashlib.sha1(' '.join(text.lower().split()).encode(), usedforsecurity=False).hexdigest()
+
 
 class Comment(models.Model):
+    class Moderation(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        APPROVED = 'approved', 'Approved'
+        HELD = 'held', 'Held for review'
+        REJECTED = 'rejected', 'Rejected'
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    approved = models.BooleanField(default=True)
+    # New comments wait for blog.moderation; approved mirrors the status so
+    # the public queries and their partial index stay on one boolean.
+    moderation_status = models.CharField(
+        max_length=10, choices=Moderation.choices, default=Moderation.PENDING
+    )
+    moderation_note = models.CharField(max_length=200, blank=True, help_text='Rules that scored the comment')
+    approved = models.BooleanField(default=False, editable=False)
+    content_hash = models.CharField(max_length=40, editable=False)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['post', 'created_at'], condition=Q(approved=True),
+                name='comment_post_approved_idx',
+            ),
+            # Batches claimed by moderate_comments
+            models.Index(
+                fields=['id'], condition=Q(moderation_status='pending'),
+                name='comment_pending_idx',
+            ),
+            # Duplicate and per-author rate lookups of the moderation rules
+            models.Index(fields=['content_hash'], name='comment_content_hash_idx'),
+            models.Index(fields=['author', 'created_at'], name='comment_author_recent_idx'),
+        ]
 
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
+
+    def save(self, *args, **kwargs):
+        self.approved = self.moderation_status == self.Moderation.APPROVED
+        self.content_hash = content_digest(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'approved', 'content_hash'}
+        super().save(*args, **kwargs)
+
+
+class CommentSubmission(models.Model):
+    """A comment waiting in the queue processed by blog.comment_queue"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    content = models.TextField()
+    submitted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['pk']
+
+    def __str__(self):
+        return f'Queued comment by {self.author_id} on {self.post_id}'
+
+
+class PostRanking(models.Model):
+    """Materialized trending and popular scores of a post, see blog.rankings"""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='ranking')
+    # log2 of the time-decayed activity plus the age of the scoring epoch in
+    # half-lives, so rows compare correctly without being rewritten as they decay
+    trending_score = models.FloatField()
+    popular_score = models.PositiveIntegerField(default=0)
+    # view_count and approved comment count when the post was last scored
+    views_seen = models.PositiveIntegerField(default=0)
+    comments_seen = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-trending_score'], name='ranking_trending_idx'),
+            models.Index(fields=['-popular_score'], name='ranking_popular_idx'),
+        ]
+
+    def __str__(self):
+        return f'Ranking of {self.post_id}'
+
+
+class Term(models.Model):
+    """
+    A word of the related-posts vocabulary and how many posts use it, see
+    blog.related; the row for the empty term counts the posts themselves.
+    """
+    term = models.CharField(max_length=64, unique=True)
+    document_count = models.PositiveIntegerField()
+
+    def __str__(self):
+        return self.term
+
+
+class PostTerm(models.Model):
+    """One of the highest TF-IDF weighted terms of a post; the inverted index of blog.related"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    term = models.ForeignKey(Term, on_delete=models.CASCADE, related_name='+')
+    # Weights of a post's terms form a unit vector
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'term'], name='postterm_post_term_unique'),
+        ]
+        # Champion lists: a term's highest weighted posts first
+        indexes = [models.Index(fields=['term', '-weight'], name='postterm_term_weight_idx')]
+
+
+class RelatedPost(models.Model):
+    """Precomputed most similar posts of a post, best first"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['post_id', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'rank'], name='relatedpost_post_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.related_id} related to {self.post_id}'
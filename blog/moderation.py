@@ -0,0 +1,285 @@
+"""
+Batch comment moderation.
+
+New comments are ``pending`` and hidden. ``manage.py moderate_comments``
+(run it with ``--loop`` as a worker) claims them in batches and scores
+each batch with the rules listed in ``BLOG_MODERATION_RULES``. A rule
+loads everything it needs for the whole batch in ``prepare()``, usually
+with one query, then ``score()`` returns the points of one comment
+without touching the database. Comments scoring
+``BLOG_MODERATION_REJECT_SCORE`` or more are rejected, those scoring
+``BLOG_MODERATION_HOLD_SCORE`` or more are held for a moderator, and
+the rest are approved. Decisions are written with one UPDATE per outcome,
+never a save() per row, and the pages of the affected posts are purged
+once per batch.
+
+The built-in rules catch double submissions and copied text (by content
+hash), comments with too many links, authors posting faster than
+``BLOG_MODERATION_RATE_LIMIT`` comments per
+``BLOG_MODERATION_RATE_WINDOW`` seconds, ``BLOG_MODERATION_KEYWORDS``
+(compiled into a single regular expression) and deactivated accounts.
+Custom rules subclass ``Rule``.
+
+``blog.comment_queue`` runs the same rules on its batches before they are
+inserted, and the comment admin can re-run them on a selection. On
+PostgreSQL several workers can moderate at once, since rows are claimed
+with ``SELECT ... FOR UPDATE SKIP LOCKED``; on SQLite run one.
+"""
+
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .cache import bump
+from .models import Comment
+
+Moderation = Comment.Moderation
+
+DEFAULT_RULES = [
+    'blog.moderation.InactiveAuthorRule',
+    'blog.moderation.DuplicateRule',
+    'blog.moderation.LinkRule',
+    'blog.moderation.RateRule',
+    'blog.moderation.KeywordRule',
+]
+
+LINK = re.compile(r'https?://|\bwww\.', re.IGNORECASE)
+
+
+class Rule:
+    """
+    Scores comments a batch at a time. ``prepare()`` is called once with
+    the whole batch, in submission order, then ``score()`` once per
+    comment in that order. Comments may be unsaved (from the comment
+    queue), in which case ``pk`` and ``created_at`` are None.
+    """
+    name = ''
+    points = 5
+
+    def prepare(self, comments):
+        pass
+
+    def score(self, comment):
+        return 0
+
+
+class InactiveAuthorRule(Rule):
+    name = 'inactive author'
+    points = 10
+
+    def prepare(self, comments):
+        self.inactive = set(User.objects.filter(
+            pk__in={comment.author_id for comment in comments}, is_active=False
+        ).values_list('pk', flat=True))
+
+    def score(self, comment):
+        return self.points if comment.author_id in self.inactive else 0
+
+
+class DuplicateRule(Rule):
+    """
+    The same text by the same author on the same post again scores
+    ``points``; longer text already posted anywhere else scores
+    ``copy_points``. Short replies ("Thanks!") are legitimately common.
+    """
+    name = 'duplicate'
+    points = 10
+    copy_points = 5
+    min_copy_length = 40
+
+    def prepare(self, comments):
+        digests = {comment.content_hash for comment in comments}
+        earlier = _earlier(comments).filter(content_hash__in=digests)
+        self.posted = set(earlier.filter(
+            author_id__in={comment.author_id for comment in comments}
+        ).values_list('content_hash', 'author_id', 'post_id'))
+        self.copies = Counter(dict(earlier.filter(
+            content_hash__in={c.content_hash for c in comments if len(c.content) >= self.min_copy_length}
+        ).values('content_hash').annotate(total=Count('pk')).values_list('content_hash', 'total')))
+
+    def score(self, comment):
+        key = (comment.content_hash, comment.author_id, comment.post_id)
+        repeated = key in self.posted
+        copied = self.copies[comment.content_hash] and len(comment.content) >= self.min_copy_length
+        # Later comments in the batch are checked against this one too
+        self.posted.add(key)
+        self.copies[comment.content_hash] += 1
+        if repeated:
+            return self.points
+        return self.copy_points if copied else 0
+
+
+class LinkRule(Rule):
+    """``points`` for every link beyond ``BLOG_MODERATION_MAX_LINKS``"""
+    name = 'links'
+
+    def prepare(self, comments):
+        self.max_links = getattr(settings, 'BLOG_MODERATION_MAX_LINKS', 2)
+
+    def score(self, comment):
+        return max(len(LINK.findall(comment.content)) - self.max_links, 0) * self.points
+
+
+class RateRule(Rule):
+    """
+    ``points`` once an author exceeds ``BLOG_MODERATION_RATE_LIMIT``
+    comments in ``BLOG_MODERATION_RATE_WINDOW`` seconds, twice that beyond
+    double the limit.
+    """
+    name = 'rate'
+
+    def prepare(self, comments):
+        self.limit = getattr(settings, 'BLOG_MODERATION_RATE_LIMIT', 10)
+        self.now = timezone.now()
+        self.since = self.now - timedelta(seconds=getattr(settings, 'BLOG_MODERATION_RATE_WINDOW', 600))
+        self.counts = Counter(dict(_earlier(comments).filter(
+            author_id__in={comment.author_id for comment in comments}, created_at__gte=self.since,
+        ).order_by().values('author_id').annotate(total=Count('pk')).values_list('author_id', 'total')))
+
+    def score(self, comment):
+        if (comment.created_at or self.now) < self.since:
+            return 0
+        self.counts[comment.author_id] += 1
+        posted = self.counts[comment.author_id]
+        if posted > 2 * self.limit:
+            return 2 * self.points
+        return self.points if posted > self.limit else 0
+
+
+def _trie_pattern(node):
+    branches = [
+        (r'\s+' if char == ' ' else re.escape(char)) + _trie_pattern(child)
+        for char, child in sorted(node.items()) if char
+    ]
+    if not branches:
+        return ''
+    if len(branches) == 1 and '' not in node:
+        return branches[0]
+    group = '(?:' + '|'.join(branches) + ')'
+    return group + '?' if '' in node else group
+
+
+@lru_cache(maxsize=8)
+def keyword_pattern(keywords):
+    """
+    One case-insensitive regex matching any of ``keywords`` (words or
+    phrases) as whole words. It is built from their trie, so keywords
+    sharing a prefix share a branch and a comment is scanned once, however
+    long the list.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in ' '.join(keyword.lower().split()):
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return re.compile(r'\b' + _trie_pattern(trie) + r'\b', re.IGNORECASE)
+
+
+class KeywordRule(Rule):
+    """``points`` for every distinct keyword of ``BLOG_MODERATION_KEYWORDS`` found"""
+    name = 'keywords'
+
+    def prepare(self, comments):
+        keywords = tuple(
+            keyword for keyword in getattr(settings, 'BLOG_MODERATION_KEYWORDS', ()) if keyword.strip()
+        )
+        self.pattern = keyword_pattern(keywords) if keywords else None
+
+    def score(self, comment):
+        if self.pattern is None:
+            return 0
+        found = {' '.join(match.lower().split()) for match in self.pattern.findall(comment.content)}
+        return len(found) * self.points
+
+
+def _earlier(comments):
+    """Comments posted before the batch; rules track the batch itself as they score it"""
+    queryset = Comment.objects.order_by()
+    pks = [comment.pk for comment in comments if comment.pk is not None]
+    if pks:
+        queryset = queryset.filter(pk__lt=min(pks))
+    return queryset
+
+
+def load_rules():
+    """Fresh instances of the ``BLOG_MODERATION_RULES`` classes, for one batch"""
+    return [import_string(path)() for path in getattr(settings, 'BLOG_MODERATION_RULES', DEFAULT_RULES)]
+
+
+def decide(comments):
+    """
+    Score ``comments`` together; returns ``[(comment, status, note)]``,
+    where ``note`` names the rules that scored.
+    """
+    rules = load_rules()
+    for rule in rules:
+        rule.prepare(comments)
+    hold = getattr(settings, 'BLOG_MODERATION_HOLD_SCORE', 5)
+    reject = getattr(settings, 'BLOG_MODERATION_REJECT_SCORE', 10)
+
+    decisions = []
+    for comment in comments:
+        total, fired = 0, []
+        for rule in rules:
+            points = rule.score(comment)
+            if points:
+                total += points
+                fired.append(rule.name)
+        if total >= reject:
+            status = Moderation.REJECTED
+        elif total >= hold:
+            status = Moderation.HELD
+        else:
+            status = Moderation.APPROVED
+        decisions.append((comment, status, ', '.join(fired)[:200]))
+    return decisions
+
+
+def moderate(comments):
+    """
+    Decide saved ``comments`` and store the decisions, one UPDATE per
+    outcome; returns a Counter of statuses.
+    """
+    groups = defaultdict(list)
+    outcomes = Counter()
+    changed = set()
+    for comment, status, note in decide(comments):
+        outcomes[status] += 1
+        groups[status, note].append(comment.pk)
+        if comment.approved != (status == Moderation.APPROVED):
+            changed.add(comment.post_id)
+
+    # update() skips auto_now; rankings and Last-Modified read updated_at
+    now = timezone.now()
+    for (status, note), pks in groups.items():
+        Comment.objects.filter(pk__in=pks).update(
+            moderation_status=status, moderation_note=note,
+            approved=status == Moderation.APPROVED, updated_at=now,
+        )
+    # update() sends no signals, so expire the pages whose comments changed
+    if changed:
+        transaction.on_commit(lambda: bump('comment', *(f'post:{pk}' for pk in changed)))
+    return outcomes
+
+
+def moderate_pending(batch_size=1000):
+    """Moderate up to ``batch_size`` pending comments, oldest first; returns a Counter of statuses"""
+    with transaction.atomic():
+        queue = Comment.objects.filter(moderation_status=Moderation.PENDING).order_by('pk').only(
+            'pk', 'post_id', 'author_id', 'content', 'content_hash', 'created_at', 'approved'
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            queue = queue.select_for_update(skip_locked=True)
+        comments = list(queue[:batch_size])
+        if not comments:
+            return Counter()
+        return moderate(comments)
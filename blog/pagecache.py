@@ -0,0 +1,161 @@
+"""
+Full-page cache for anonymous GET requests.
+
+Views opt in with ``tag_page(request, *tags)``, naming the generation
+counters from ``blog.cache`` that the page depends on: the model-wide
+``'post'``/``'comment'``/``'category'`` or per-object tags such as
+``'post:12'``, ``'category:3'`` and ``'author:7'`` (see ``post_tags``).
+Views whose tags are only known once the page's object is loaded call
+``watch(request, ...)`` with the model-wide generations first. Every
+writer bumps those before the per-object tags, so if one moved while
+the page loaded, the page may predate the write and is not stored.
+``AnonymousPageCacheMiddleware`` stores the rendered response under its
+path and query string together with the value each tag had when the view
+started, and serves it only while every tag still has that value. The
+receivers in ``blog.signals`` bump the tags of whatever they save or
+delete, so a page is purged exactly when something it shows changes.
+
+Requests carrying a session or messages cookie always reach the view, and
+responses that set cookies are never stored. Cached pages keep the ETag
+and Last-Modified validators the view set (see ``blog.conditional``), and
+conditional requests for them are answered with 304 straight from the
+cache.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_http_date_safe
+
+from . import counters
+from .cache import get_generations
+
+PAGE_KEY = 'blog:page:v2:%s'
+
+
+def post_tags(post, category_id=None):
+    """Tags of the pages that show ``post``: its own, its author's and its category's"""
+    tags = {f'post:{post.pk}', f'author:{post.author_id}', f'category:{post.category_id}'}
+    if category_id is not None:
+        tags.add(f'category:{category_id}')
+    return tags
+
+
+def _enabled(request):
+    return getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 300) and is_cacheable_request(request)
+
+
+def watch(request, *names):
+    """
+    Read the model-wide generations ``names`` before loading an object
+    whose tags ``tag_page`` needs; see the module docstring.
+    """
+    if _enabled(request):
+        request.page_cache_watch = get_generations(names)
+
+
+def tag_page(request, *tags, post_id=None):
+    """
+    Mark the response to ``request`` as cacheable for anonymous users until
+    one of ``tags`` is bumped. Call it, or ``watch()``, before loading what
+    the page shows so a concurrent write is never stored under its new
+    version. Hits for pages with a ``post_id`` still count as views of that
+    post.
+    """
+    if not _enabled(request):
+        return
+    watched = getattr(request, 'page_cache_watch', {})
+    generations = get_generations([*watched, *tags])
+    if any(generations[name] != value for name, value in watched.items()):
+        return  # something was saved while the page loaded
+    request.page_cache = ({tag: generations[tag] for tag in tags}, post_id)
+
+
+def _key(request):
+    digest = hashlib.md5(request.get_full_path().encode(), usedforsecurity=False).hexdigest()
+    return PAGE_KEY % digest
+
+
+def is_cacheable_request(request):
+    cookies = request.COOKIES
+    return (
+        request.method == 'GET'
+        and settings.SESSION_COOKIE_NAME not in cookies
+        and CookieStorage.cookie_name not in cookies
+    )
+
+
+def is_cacheable_response(request, response):
+    return (
+        hasattr(request, 'page_cache')
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def get(request):
+    """Return ``(response, post_id)`` from the cache, or None if missing or stale"""
+    entry = cache.get(_key(request))
+    if entry is None:
+        return None
+    versions, post_id, route, response = entry
+    if get_generations(versions) != versions:
+        return None
+    # Lets the middleware above read BLOG_RESPONSE_ROUTES without resolving
+    request.page_cache_route = route
+    return response, post_id
+
+
+def store(request, response, timeout):
+    versions, post_id = request.page_cache
+    if not response.has_header('ETag'):
+        set_response_etag(response)
+    match = request.resolver_match
+    route = (match.namespace, match.view_name) if match is not None else None
+    cache.set(_key(request), (versions, post_id, route, response), timeout)
+
+
+def conditional(request, response):
+    """Answer If-None-Match/If-Modified-Since with 304 when they match"""
+    last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+    return get_conditional_response(
+        request, etag=response.get('ETag'), last_modified=last_modified, response=response
+    )
+
+
+class AnonymousPageCacheMiddleware(MiddlewareMixin):
+    """
+    Serve and store tagged pages; goes above SessionMiddleware so a hit
+    never loads the session or the user. ``BLOG_PAGE_CACHE_TIMEOUT = 0``
+    disables it. Works in sync and async middleware stacks.
+    """
+
+    def __init__(self, get_response):
+        self.timeout = getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 300)
+        if not self.timeout:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        if not is_cacheable_request(request):
+            return None
+        hit = get(request)
+        if hit is None:
+            return None
+        response, post_id = hit
+        if post_id is not None:
+            counters.record_view(post_id)
+        return conditional(request, response)
+
+    def process_response(self, request, response):
+        if is_cacheable_request(request) and is_cacheable_response(request, response):
+            store(request, response, self.timeout)
+            return conditional(request, response)
+        return response
@@ -0,0 +1,182 @@
+"""
+Keyset (cursor) pagination for the post list views.
+
+``Paginator`` pages with OFFSET and runs a COUNT(*) per request; both get
+slower the deeper and larger the listing. ``KeysetPaginator`` orders by
+``(-created_at, -id)`` and seeks past the last row it served, so every page
+costs the same indexed range scan. Cursors are opaque URL-safe tokens that
+also carry the page number, and the total count is cached for a short
+while, so templates written for ``Paginator`` pages keep working.
+
+Set ``BLOG_PAGINATION = 'keyset'`` to switch the list views over; the
+default is offset pagination.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+COUNT_KEY = 'blog:page-count:%s'
+# Largest value of a 64-bit primary key; larger cursor values overflow the
+# database's integer parameters.
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_cursor(direction, number, post=None):
+    """Build an opaque cursor; ``post`` is the row to seek past"""
+    key = [post.created_at.isoformat(), post.pk] if post is not None else None
+    data = json.dumps([direction, number, key], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor):
+    """Return ``(direction, number, created_at, id)`` or None if invalid"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, number, key = json.loads(data)
+        if direction == 'last':
+            return direction, None, None, None
+        created_at, pk = key
+        number, pk = int(number), int(pk)
+        if not 0 < pk <= MAX_ID or number > MAX_ID:
+            return None
+        return direction, max(number, 1), datetime.fromisoformat(created_at), pk
+    except (binascii.Error, TypeError, ValueError, OverflowError):
+        return None
+
+
+class KeysetPaginator:
+    is_keyset = True
+
+    def __init__(self, queryset, per_page, count_timeout=None):
+        self.queryset = queryset.order_by('-created_at', '-id')
+        self.per_page = per_page
+        if count_timeout is None:
+            count_timeout = getattr(settings, 'BLOG_PAGINATION_COUNT_TIMEOUT', 60)
+        self.count_timeout = count_timeout
+
+    @cached_property
+    def count(self):
+        """Total number of rows, cached for ``count_timeout`` seconds"""
+        sql, params = self.queryset.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}{params!r}'.encode(), usedforsecurity=False).hexdigest()
+        return cache.get_or_set(COUNT_KEY % digest, self.queryset.count, self.count_timeout)
+
+    @cached_property
+    def num_pages(self):
+        return max(1, -(-self.count // self.per_page))
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def get_page(self, cursor=None):
+        """Return the page a cursor points at, or the first page"""
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            rows = list(self.queryset[:self.per_page + 1])
+            return KeysetPage(self, rows[:self.per_page], 1,
+                              has_next=len(rows) > self.per_page, has_previous=False)
+
+        direction, number, created_at, pk = decoded
+        if direction == 'next':
+            rows = list(self.queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )[:self.per_page + 1])
+            return KeysetPage(self, rows[:self.per_page], number,
+                              has_next=len(rows) > self.per_page, has_previous=True)
+
+        if direction == 'prev':
+            rows = list(self.queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            return KeysetPage(self, rows[:self.per_page][::-1],
+                              number if has_previous else 1,
+                              has_next=True, has_previous=has_previous)
+
+        if direction != 'last':
+            return self.get_page()
+
+        # Read the tail of the listing backwards.
+        size = self.count % self.per_page or self.per_page
+        rows = list(self.queryset.order_by('created_at', 'id')[:size])
+        return KeysetPage(self, rows[::-1], self.num_pages,
+                          has_next=False, has_previous=self.num_pages > 1)
+
+
+class KeysetPage(Sequence):
+    """A page with the same interface as ``django.core.paginator.Page``"""
+
+    def __init__(self, paginator, object_list, number, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<Keyset page {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return max(self.number - 1, 1)
+
+    def start_index(self):
+        return (self.number - 1) * self.paginator.per_page + 1 if self.object_list else 0
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor('next', self.number + 1, self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor('prev', self.previous_page_number(), self.object_list[0])
+        return None
+
+    @property
+    def last_cursor(self):
+        return encode_cursor('last', self.paginator.num_pages)
+
+
+def paginate(request, queryset, per_page, keyset=True):
+    """
+    Page ``queryset`` for a list view using the paginator selected by
+    ``BLOG_PAGINATION``. Pass ``keyset=False`` for querysets that are not
+    ordered by recency (e.g. ranked search results).
+    """
+    if keyset and getattr(settings, 'BLOG_PAGINATION', 'offset') == 'keyset':
+        return KeysetPaginator(queryset, per_page).get_page(request.GET.get('cursor'))
+    return Paginator(queryset, per_page).get_page(request.GET.get('page'))
@@ -0,0 +1,134 @@
+"""
+Materialized "trending" and "popular" post rankings.
+
+``compute()`` runs periodically (``manage.py compute_rankings``) and
+stores scores in ``PostRanking``, so the home page reads its sidebar with
+one indexed query per list instead of ranking posts at request time.
+
+Activity is the increase in a post's ``view_count`` plus
+``BLOG_RANKING_COMMENT_WEIGHT`` times the increase in its approved
+comments since the post was last scored. The popular score is the
+all-time total of the same measure.
+
+The trending score decays by half every ``BLOG_TRENDING_HALF_LIFE_HOURS``.
+It is stored as ``log2(decayed activity) + t / half_life``, where ``t`` is
+the time since a fixed epoch. Decaying every score by the same factor
+keeps their order, so the rows stay correctly ordered without being
+rewritten as they age. Each run only touches posts with new activity.
+Comparing a score with ``t_now / half_life`` gives the log2 of its decayed
+value today.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .cache import bump
+from .models import Comment, Post, PostRanking
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+# Comments are found by updated_at; the margin covers transactions that
+# committed after the previous run had started.
+COMMENT_MARGIN = timedelta(minutes=5)
+
+
+def half_life_seconds():
+    return getattr(settings, 'BLOG_TRENDING_HALF_LIFE_HOURS', 6) * 3600
+
+
+def comment_weight():
+    return getattr(settings, 'BLOG_RANKING_COMMENT_WEIGHT', 5)
+
+
+def epoch_offset(when):
+    """Half-lives elapsed between EPOCH and ``when``"""
+    return (when - EPOCH).total_seconds() / half_life_seconds()
+
+
+def _log2_add(a, b):
+    """log2(2**a + 2**b) without overflowing"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def _comment_counts(since):
+    """Approved comment counts of the posts whose comments changed since ``since``"""
+    approved = Comment.objects.filter(approved=True).order_by().values('post')
+    if since is None:
+        touched = set(Comment.objects.order_by().values_list('post', flat=True).distinct())
+    else:
+        touched = set(
+            Comment.objects.filter(updated_at__gte=since - COMMENT_MARGIN)
+            .order_by().values_list('post', flat=True).distinct()
+        )
+        approved = approved.filter(post__in=touched)
+    counts = dict.fromkeys(touched, 0)
+    counts.update(approved.annotate(total=Count('pk')).values_list('post', 'total'))
+    return counts
+
+
+def compute(now=None):
+    """Score the posts with new views or comments; return how many changed"""
+    now = now or timezone.now()
+    since = PostRanking.objects.aggregate(last=Max('computed_at'))['last']
+
+    views = dict(
+        Post.objects.filter(
+            Q(ranking__isnull=True, view_count__gt=0) | Q(view_count__gt=F('ranking__views_seen'))
+        ).values_list('pk', 'view_count')
+    )
+    comments = _comment_counts(since)
+    existing = PostRanking.objects.in_bulk(views.keys() | comments.keys())
+
+    weight = comment_weight()
+    offset = epoch_offset(now)
+    changed = []
+    for post_id in views.keys() | comments.keys():
+        ranking = existing.get(post_id)
+        if ranking is None:
+            ranking = PostRanking(post_id=post_id, trending_score=float('-inf'))
+        view_total = views.get(post_id, ranking.views_seen)
+        comment_total = comments.get(post_id, ranking.comments_seen)
+
+        activity = (
+            max(view_total - ranking.views_seen, 0)
+            + weight * max(comment_total - ranking.comments_seen, 0)
+        )
+        popular = view_total + weight * comment_total
+        if not activity and popular == ranking.popular_score:
+            continue
+        if activity:
+            ranking.trending_score = _log2_add(ranking.trending_score, math.log2(activity) + offset)
+        ranking.popular_score = popular
+        ranking.views_seen = view_total
+        ranking.comments_seen = comment_total
+        ranking.computed_at = now
+        changed.append(ranking)
+
+    if changed:
+        PostRanking.objects.bulk_create(
+            changed, batch_size=500, update_conflicts=True, unique_fields=['post'],
+            update_fields=['trending_score', 'popular_score', 'views_seen', 'comments_seen', 'computed_at'],
+        )
+        bump('ranking')
+    return len(changed)
+
+
+def trending(limit=5):
+    """Lazy queryset of the published posts with the most recent activity"""
+    # Decayed activity of at least one view
+    threshold = epoch_offset(timezone.now())
+    return Post.objects.filter(
+        published=True, ranking__trending_score__gte=threshold
+    ).order_by('-ranking__trending_score').only('title', 'slug')[:limit]
+
+
+def popular(limit=5):
+    """Lazy queryset of the published posts with the most activity overall"""
+    return Post.objects.filter(
+        published=True, ranking__popular_score__gt=0
+    ).order_by('-ranking__popular_score').only('title', 'slug')[:limit]
@@ -0,0 +1,355 @@
+"""
+Related posts by content similarity.
+
+Each published post is reduced to its ``BLOG_RELATED_TERMS`` highest
+TF-IDF weighted words of the title (counted twice) and content. The
+weights form a unit vector, so the dot product of two posts is their
+cosine similarity. These signatures are stored in ``PostTerm``, which is
+also the inverted index, and the best matches of each post in
+``RelatedPost``. ``post_detail`` reads them back with one indexed query.
+
+Candidates come from champion lists: for each term only the
+``CHAMPIONS`` posts that weigh it most are considered. That bounds the
+work per post whatever the corpus size, at the cost of occasionally
+missing a match through a very common word.
+
+``build()`` (``manage.py compute_related``) recomputes everything. The
+document frequencies come from the whole corpus, and the scoring runs in
+batches of posts with NumPy when it is installed (pure Python otherwise,
+fine for small blogs). Between builds, ``update_post()`` re-scores a
+saved post against the stored index. It uses the document frequencies of
+the last build and also updates the lists of the posts it now matches.
+"""
+
+import math
+import re
+from array import array
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from .cache import bump
+from .models import Post, PostTerm, RelatedPost, Term
+
+
+def _numpy():
+    """
+    NumPy, or None if it is not installed. Imported on first use rather than
+    with this module: it would otherwise add ~90ms to the start-up of every
+    process, since the signal receivers import this module.
+    """
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return numpy
+
+
+TOKEN = re.compile(r'[^\W\d_]{3,64}')
+STOP_WORDS = frozenset(
+    'the and but for with from about into over after before under between through '
+    'during without within across against you they this that these those our your '
+    'their its are was were been being have has had does did can could will would '
+    'should may might must also just only not then than there here when where which '
+    'who what how all any some such very more most other into out off yet'.split()
+)
+TITLE_WEIGHT = 2
+# The Term row with this term, which no token can match, holds the number of
+# posts the document counts of the last build were taken over.
+CORPUS = ''
+
+# Postings per term looked at when searching for candidates
+CHAMPIONS = 100
+# Cosine similarity below which posts are not considered related
+MIN_SCORE = 0.05
+
+
+def related_count():
+    return getattr(settings, 'BLOG_RELATED_POSTS', 3)
+
+
+def stored_count():
+    # Spare neighbours stand in for related posts that get unpublished
+    return related_count() * 2
+
+
+def terms_per_post():
+    return getattr(settings, 'BLOG_RELATED_TERMS', 16)
+
+
+def tokens(title, content):
+    """Term counts of a post, with title words counted TITLE_WEIGHT times"""
+    counts = Counter(TOKEN.findall(content.lower()))
+    for word in TOKEN.findall(title.lower()):
+        counts[word] += TITLE_WEIGHT
+    for word in STOP_WORDS.intersection(counts):
+        del counts[word]
+    return counts
+
+
+def idf(document_count, total):
+    return math.log((1 + total) / (1 + document_count)) + 1
+
+
+def signature(counts, idfs):
+    """The post's ``terms_per_post()`` best weighted terms as a unit vector"""
+    weights = [
+        (term, (1 + math.log(count)) * idfs[term])
+        for term, count in counts.items() if term in idfs
+    ]
+    weights.sort(key=lambda item: item[1], reverse=True)
+    weights = weights[:terms_per_post()]
+    norm = math.sqrt(sum(weight * weight for _, weight in weights))
+    return [(term, weight / norm) for term, weight in weights] if norm else []
+
+
+def _published():
+    return Post.objects.filter(published=True).order_by('pk').values_list('pk', 'title', 'content')
+
+
+def build(batch_size=1000, log=None):
+    """Recompute every signature and related list. Returns the number of lists."""
+    log = log or (lambda message: None)
+
+    document_counts = Counter()
+    total = 0
+    for _, title, content in _published().iterator(chunk_size=2000):
+        document_counts.update(tokens(title, content).keys())
+        total += 1
+    # Words used once cannot relate two posts; words in nearly every post do
+    # not say anything about either.
+    vocabulary = {
+        term: count for term, count in document_counts.items()
+        if 2 <= count <= max(2, total * 0.9)
+    }
+    idfs = {term: idf(count, total) for term, count in vocabulary.items()}
+    log(f'{total} posts, {len(vocabulary)} terms')
+
+    term_ids = {term: index for index, term in enumerate(sorted(vocabulary))}
+    post_ids = array('q')
+    offsets = array('q', [0])
+    entry_terms = array('q')
+    entry_weights = array('d')
+    for pk, title, content in _published().iterator(chunk_size=2000):
+        post_ids.append(pk)
+        for term, weight in signature(tokens(title, content), idfs):
+            entry_terms.append(term_ids[term])
+            entry_weights.append(weight)
+        offsets.append(len(entry_terms))
+
+    neighbours = (_neighbours_numpy if _numpy() is not None else _neighbours_python)(
+        post_ids, offsets, entry_terms, entry_weights, len(term_ids), batch_size
+    )
+    lists = {
+        post_ids[index]: [post_ids[other] for other, _ in matches]
+        for index, matches in enumerate(neighbours) if matches
+    }
+
+    with transaction.atomic():
+        previous = defaultdict(list)
+        for post_id, related_id in RelatedPost.objects.order_by('post_id', 'rank').values_list('post_id', 'related_id'):
+            previous[post_id].append(related_id)
+        RelatedPost.objects.all().delete()
+        PostTerm.objects.all().delete()
+        Term.objects.all().delete()
+        terms = Term.objects.bulk_create(
+            [Term(term=term, document_count=vocabulary[term]) for term in term_ids],
+            batch_size=2000,
+        )
+        Term.objects.create(term=CORPUS, document_count=total)
+        term_pks = [term.pk for term in terms]
+        _insert(PostTerm, ['post_id', 'term_id', 'weight'], (
+            (post_ids[index], term_pks[entry_terms[entry]], entry_weights[entry])
+            for index in range(len(post_ids))
+            for entry in range(offsets[index], offsets[index + 1])
+        ))
+        _insert(RelatedPost, ['post_id', 'related_id', 'rank', 'score'], (
+            (post_ids[index], post_ids[other], rank, score)
+            for index, matches in enumerate(neighbours)
+            for rank, (other, score) in enumerate(matches)
+        ))
+    # Purge the pages of the posts whose list changed, not every post page
+    changed = [pk for pk in previous.keys() | lists.keys() if previous.get(pk) != lists.get(pk)]
+    bump('post', *(f'post:{pk}' for pk in changed))
+    return len(lists)
+
+
+def _insert(model, columns, rows, batch_size=5000):
+    """Insert millions of plain tuples; model instances would dominate the build time"""
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+
+
+def _champions(entries, weights, limit):
+    """Entry indexes of the ``limit`` highest weights, best first"""
+    return sorted(entries, key=lambda entry: weights[entry], reverse=True)[:limit]
+
+
+def _neighbours_python(post_ids, offsets, entry_terms, entry_weights, term_count, batch_size):
+    documents = array('q')
+    for index in range(len(post_ids)):
+        documents.extend([index] * (offsets[index + 1] - offsets[index]))
+    postings = defaultdict(list)
+    for entry, term in enumerate(entry_terms):
+        postings[term].append(entry)
+    postings = {
+        term: [(documents[entry], entry_weights[entry]) for entry in _champions(entries, entry_weights, CHAMPIONS)]
+        for term, entries in postings.items()
+    }
+
+    keep = stored_count()
+    neighbours = []
+    for index in range(len(post_ids)):
+        scores = defaultdict(float)
+        for entry in range(offsets[index], offsets[index + 1]):
+            weight = entry_weights[entry]
+            for other, other_weight in postings[entry_terms[entry]]:
+                scores[other] += weight * other_weight
+        scores.pop(index, None)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:keep]
+        neighbours.append([(other, score) for other, score in best if score >= MIN_SCORE])
+    return neighbours
+
+
+def _neighbours_numpy(post_ids, offsets, entry_terms, entry_weights, term_count, batch_size):
+    np = _numpy()
+    count = len(post_ids)
+    offsets = np.frombuffer(offsets, dtype=np.int64)
+    terms = np.frombuffer(entry_terms, dtype=np.int64)
+    weights = np.frombuffer(entry_weights, dtype=np.float64)
+    documents = np.repeat(np.arange(count), np.diff(offsets))
+
+    # Champion lists: postings sorted by term, then by weight descending,
+    # truncated to CHAMPIONS per term.
+    order = np.lexsort((-weights, terms))
+    sorted_terms = terms[order]
+    starts = np.searchsorted(sorted_terms, np.arange(term_count))
+    ends = np.minimum(np.searchsorted(sorted_terms, np.arange(term_count), side='right'), starts + CHAMPIONS)
+    posting_documents = documents[order]
+    posting_weights = weights[order]
+
+    keep = stored_count()
+    neighbours = []
+    for first in range(0, count, batch_size):
+        last = min(first + batch_size, count)
+        lo, hi = offsets[first], offsets[last]
+        query_terms = terms[lo:hi]
+
+        # Gather the champion postings of every query term in one go.
+        lengths = ends[query_terms] - starts[query_terms]
+        repeat = np.repeat(np.arange(hi - lo), lengths)
+        within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        postings = starts[query_terms][repeat] + within
+
+        # Sum the products per (query post, candidate) pair.
+        pairs, inverse = np.unique(
+            documents[lo:hi][repeat] * count + posting_documents[postings], return_inverse=True
+        )
+        scores = np.bincount(inverse, weights=weights[lo:hi][repeat] * posting_weights[postings])
+        rows, candidates = np.divmod(pairs, count)
+        wanted = (rows != candidates) & (scores >= MIN_SCORE)
+        rows, candidates, scores = rows[wanted], candidates[wanted], scores[wanted]
+
+        # Best first within each query post, then the first ``keep`` of each.
+        # Cosine scores are at most 1, so one float key sorts by both (and
+        # is much faster than np.lexsort).
+        order = np.argsort(rows * 4.0 - scores)
+        rows, candidates, scores = rows[order], candidates[order], scores[order]
+        row_starts = np.searchsorted(rows, np.arange(first, last + 1))
+        for row in range(last - first):
+            best = slice(row_starts[row], min(row_starts[row + 1], row_starts[row] + keep))
+            neighbours.append(list(zip(candidates[best].tolist(), scores[best].tolist())))
+    return neighbours
+
+
+def _candidates(vector):
+    """``{post_id: similarity}`` from the champion lists of the vector's terms"""
+    scores = defaultdict(float)
+    # One short index range scan per term, on (term, -weight)
+    for term_id, weight in vector.items():
+        postings = PostTerm.objects.filter(term=term_id).order_by('-weight')[:CHAMPIONS]
+        for post_id, other_weight in postings.values_list('post', 'weight'):
+            scores[post_id] += weight * other_weight
+    return scores
+
+
+def _rewrite(lists):
+    """Replace the related lists ``{post_id: [(related_id, score)]}``"""
+    RelatedPost.objects.filter(post__in=lists).delete()
+    RelatedPost.objects.bulk_create([
+        RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+        for post_id, matches in lists.items()
+        for rank, (related_id, score) in enumerate(matches)
+    ])
+
+
+@transaction.atomic
+def update_post(post):
+    """Re-score ``post`` after a save, and the lists it enters or leaves"""
+    PostTerm.objects.filter(post=post).delete()
+    vector = {}
+    if post.published:
+        counts = tokens(post.title, post.content)
+        known = {
+            term: (pk, document_count)
+            for term, pk, document_count in Term.objects.filter(term__in=[CORPUS, *counts]).values_list(
+                'term', 'pk', 'document_count'
+            )
+        }
+        # The document counts are those of the last build, so is the total
+        _, total = known.pop(CORPUS, (None, None))
+        if total is None:  # index built before the total was stored
+            total = Post.objects.filter(published=True).count()
+        idfs = {term: idf(document_count, total) for term, (_, document_count) in known.items()}
+        vector = {known[term][0]: weight for term, weight in signature(counts, idfs)}
+
+    scores = _candidates(vector) if vector else {}
+    scores.pop(post.pk, None)
+    scores = {post_id: score for post_id, score in scores.items() if score >= MIN_SCORE}
+    PostTerm.objects.bulk_create([
+        PostTerm(post=post, term_id=term_id, weight=weight) for term_id, weight in vector.items()
+    ])
+
+    keep = stored_count()
+    lists = {post.pk: sorted(scores.items(), key=lambda item: item[1], reverse=True)[:keep]}
+    # Lists that hold the post or that it now belongs to
+    current = defaultdict(dict)
+    others = RelatedPost.objects.filter(post__in=scores.keys()) | RelatedPost.objects.filter(related=post)
+    for other, related_id, score in others.values_list('post', 'related', 'score'):
+        current[other][related_id] = score
+    for other in scores.keys() | current.keys():
+        matches = current[other]
+        before = sorted(matches.items(), key=lambda item: item[1], reverse=True)[:keep]
+        matches.pop(post.pk, None)
+        if other in scores:
+            matches[post.pk] = scores[other]
+        after = sorted(matches.items(), key=lambda item: item[1], reverse=True)[:keep]
+        if after != before:
+            lists[other] = after
+    _rewrite(lists)
+    transaction.on_commit(lambda: bump('post', *(f'post:{pk}' for pk in lists)))
+
+
+def related_posts(post, limit=None):
+    """The post's precomputed related posts, or recent ones from its category until it has some"""
+    limit = limit or related_count()
+    body_fields = ('related__content', 'related__content_html')
+    links = RelatedPost.objects.filter(
+        post=post, related__published=True
+    ).select_related('related').defer(*body_fields)[:limit]
+    posts = [link.related for link in links]
+    if posts:
+        return posts
+    return list(Post.objects.filter(
+        category=post.category_id, published=True
+    ).exclude(id=post.id).defer('content', 'content_html')[:limit])
@@ -0,0 +1,22 @@
+"""
+Pre-rendered forms of ``Post.content``.
+
+``Post.save()`` stores the list excerpt and the detail page HTML so the
+templates no longer run ``truncatewords`` and ``linebreaks`` over the full
+body on every request. The output matches those filters exactly.
+"""
+
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+EXCERPT_WORDS = 30
+
+
+def render_excerpt(content):
+    """Same result as ``{{ content|truncatewords:30 }}``"""
+    return Truncator(content).words(EXCERPT_WORDS, truncate=' …')
+
+
+def render_html(content):
+    """Same result as ``{{ content|linebreaks }}`` with autoescaping on"""
+    return linebreaks(content, autoescape=True)
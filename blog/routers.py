@@ -0,0 +1,101 @@
+"""
+Read-replica routing for the public pages.
+
+``ReplicaRouter`` sends reads of blog models to one of the aliases listed
+in ``BLOG_READ_REPLICAS``, but only while ``ReplicaRoutingMiddleware`` has
+marked the current request as safe: a GET or HEAD from a client that has
+not written anything recently. Everything else reads the primary. That
+covers writes, the requests right after a write, management commands and
+workers. Sessions and users are always read from the primary, since
+replication lag there would log people out.
+
+After an unsafe request (POST and friends) the middleware sets a short
+lived cookie that pins the client to the primary for
+``BLOG_REPLICA_STICKY_SECONDS``, so authors see their own posts and
+comments even when the replicas lag behind.
+
+To try it locally with two SQLite files, set ``BLOG_SQLITE_REPLICA`` to a
+file path and copy the primary into it with
+``manage.py sync_sqlite_replicas`` whenever you want the "replica" to
+catch up.
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'blog_primary'
+REPLICA_APPS = {'blog'}
+
+_read_from_replica = ContextVar('blog_read_from_replica', default=False)
+
+
+def replicas():
+    return getattr(settings, 'BLOG_READ_REPLICAS', [])
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if aliases and _read_from_replica.get() and model._meta.app_label in REPLICA_APPS:
+            return random.choice(aliases)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication.
+        return db not in replicas()
+
+
+class ReplicaRoutingMiddleware:
+    """Allow replica reads for safe, unpinned requests; pin clients after writes"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'BLOG_REPLICA_STICKY_SECONDS', 10)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def use_replica(self, request):
+        return request.method in ('GET', 'HEAD') and PIN_COOKIE not in request.COOKIES
+
+    def pin(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 500:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _read_from_replica.set(self.use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _read_from_replica.set(self.use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        return self.pin(request, response)
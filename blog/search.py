@@ -0,0 +1,184 @@
+"""
+Full-text search over posts.
+
+The index lives next to the ``blog_post`` table and is kept in sync by the
+Post ``post_save``/``post_delete`` receivers in ``blog.signals``:
+
+* SQLite: an FTS5 virtual table ``blog_post_fts`` keyed by the post id,
+  ranked with ``bm25()``.
+* PostgreSQL: a ``blog_post_search`` table holding a weighted ``tsvector``
+  per post behind a GIN index, ranked with ``ts_rank_cd()``.
+
+Both tables are created by migration 0002. On any other backend, or if
+SQLite was built without FTS5, searching falls back to ``icontains``.
+Hits are ranked inside the index and only the displayed page of posts is
+loaded, so a search costs one ranked index query plus one page query.
+``manage.py rebuild_search_index`` repopulates the index from scratch.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+
+SQLITE_TABLE = 'blog_post_fts'
+POSTGRES_TABLE = 'blog_post_search'
+
+# Field weights: title and author matches rank above body matches.
+SQLITE_RANK = f'bm25({SQLITE_TABLE}, 10.0, 1.0, 5.0)'
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(%s, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(%s, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(%s, '')), 'A')"
+)
+
+_available = {}
+
+
+def backend(using=DEFAULT_DB_ALIAS):
+    """Return 'sqlite', 'postgresql' or None if no index is available."""
+    connection = connections[using]
+    if using not in _available:
+        table = {'sqlite': SQLITE_TABLE, 'postgresql': POSTGRES_TABLE}.get(connection.vendor)
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+        _available[using] = connection.vendor if table in tables else None
+    return _available[using]
+
+
+def _tokens(query):
+    return re.findall(r'\w+', query)
+
+
+def index_post(post, using=DEFAULT_DB_ALIAS):
+    """Add or replace ``post`` in the search index."""
+    vendor = backend(using)
+    if vendor is None:
+        return
+    params = [post.title, post.content, post.author.username]
+    with connections[using].cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, title, content, author) '
+                'VALUES (%s, %s, %s, %s)',
+                [post.pk, *params],
+            )
+        else:
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (post_id, document) '
+                f'VALUES (%s, {POSTGRES_DOCUMENT}) '
+                'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+                [post.pk, *params],
+            )
+
+
+def remove_post(post_id, using=DEFAULT_DB_ALIAS):
+    """Drop a post from the search index."""
+    vendor = backend(using)
+    if vendor is None:
+        return
+    table, column = (SQLITE_TABLE, 'rowid') if vendor == 'sqlite' else (POSTGRES_TABLE, 'post_id')
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} = %s', [post_id])
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    """Rebuild the whole index with set-based SQL. Returns the row count."""
+    vendor = backend(using)
+    if vendor is None:
+        return 0
+    with connections[using].cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, title, content, author) '
+                'SELECT p.id, p.title, p.content, u.username '
+                'FROM blog_post p INNER JOIN auth_user u ON u.id = p.author_id'
+            )
+            cursor.execute(f'SELECT count(*) FROM {SQLITE_TABLE}')
+        else:
+            document = POSTGRES_DOCUMENT % ('p.title', 'p.content', 'u.username')
+            cursor.execute(f'TRUNCATE {POSTGRES_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (post_id, document) '
+                f'SELECT p.id, {document} '
+                'FROM blog_post p INNER JOIN auth_user u ON u.id = p.author_id'
+            )
+            cursor.execute(f'SELECT count(*) FROM {POSTGRES_TABLE}')
+        return cursor.fetchone()[0]
+
+
+class SearchResults:
+    """
+    Ranked search hits for ``Paginator``: the post ids are ranked once by
+    the index, and only the posts on the requested page are loaded.
+    """
+
+    def __init__(self, queryset, ranked_ids):
+        self.queryset = queryset
+        self.ranked_ids = ranked_ids
+
+    def count(self):
+        return len(self.ranked_ids)
+
+    def __len__(self):
+        return len(self.ranked_ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = self.ranked_ids[index]
+        posts = {post.pk: post for post in self.queryset.filter(pk__in=ids)}
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+def search_posts(queryset, query, limit=None):
+    """
+    Return the posts of ``queryset`` matching ``query``, best matches first.
+    At most ``BLOG_SEARCH_MAX_RESULTS`` hits are ranked.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return queryset.none()
+
+    vendor = backend(queryset.db)
+    if vendor is None:
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query) |
+            Q(author__username__icontains=query)
+        )
+
+    if limit is None:
+        limit = getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 1000)
+    base_sql, base_params = queryset.order_by().values('pk').query.sql_with_params()
+    if vendor == 'sqlite':
+        # Quote every token so user input cannot inject FTS5 syntax, and
+        # match prefixes so partial words still find results.
+        # The unary + stops SQLite handing the rowid filter to FTS5, which
+        # would otherwise re-run the MATCH once per candidate row.
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        sql = (
+            f'SELECT rowid FROM {SQLITE_TABLE} '
+            f'WHERE {SQLITE_TABLE} MATCH %s AND +rowid IN ({base_sql}) '
+            f'ORDER BY {SQLITE_RANK}, rowid DESC LIMIT %s'
+        )
+        params = [match, *base_params, limit]
+    else:
+        sql = (
+            f'SELECT post_id FROM {POSTGRES_TABLE}, '
+            "plainto_tsquery('english', %s) query "
+            f'WHERE document @@ query AND post_id IN ({base_sql}) '
+            'ORDER BY ts_rank_cd(document, query) DESC, post_id DESC LIMIT %s'
+        )
+        params = [' '.join(tokens), *base_params, limit]
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        ranked_ids = [row[0] for row in cursor.fetchall()]
+    return SearchResults(queryset, ranked_ids)
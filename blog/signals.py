@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import related, search
+from .cache import bump
+from .models import Category, Comment, Post
+from .pagecache import post_tags
+
+SEARCH_FIELDS = {'title', 'content', 'author'}
+RELATED_FIELDS = {'title', 'content', 'published'}
+
+
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, update_fields=None, using=None, **kwargs):
+    """Reindex a post whenever one of its searchable fields is saved"""
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    search.index_post(instance, using=using)
+
+
+@receiver(post_save, sender=Post)
+def update_related_posts(sender, instance, update_fields=None, **kwargs):
+    """Re-score a post against the related-posts index when its text or visibility changes"""
+    if update_fields is not None and not RELATED_FIELDS.intersection(update_fields):
+        return
+    related.update_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, using=None, **kwargs):
+    """Drop deleted posts from the search index"""
+    search.remove_post(instance.pk, using=using)
+
+
+def _counted_category(post):
+    """Category id the post contributes to, or None if it is not counted"""
+    data = post.__dict__
+    if data.get('published'):
+        return data.get('category_id')
+    return None
+
+
+def _adjust_count(category_id, delta, using):
+    if category_id is not None:
+        Category.objects.using(using).filter(pk=category_id).update(
+            published_post_count=F('published_post_count') + delta
+        )
+
+
+@receiver(post_init, sender=Post)
+def remember_counted_category(sender, instance, **kwargs):
+    """Remember the loaded state so saves can tell what changed"""
+    instance._counted_category = _counted_category(instance)
+    instance._loaded_category = instance.__dict__.get('category_id')
+
+
+@receiver(post_save, sender=Post)
+def update_category_counts(sender, instance, created, update_fields=None, using=None, **kwargs):
+    """Move the post between category counters on create, publish and recategorise"""
+    if update_fields is not None and not {'published', 'category'}.intersection(update_fields):
+        return
+    before = None if created else instance._counted_category
+    after = _counted_category(instance)
+    if before != after:
+        _adjust_count(before, -1, using)
+        _adjust_count(after, 1, using)
+    instance._counted_category = after
+
+
+@receiver(post_delete, sender=Post)
+def decrement_category_count(sender, instance, using=None, **kwargs):
+    """Stop counting deleted posts"""
+    _adjust_count(instance._counted_category, -1, using)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_fragments(sender, instance, using=None, **kwargs):
+    """Post cards key on updated_at; sidebars and cached pages key on generations"""
+    tags = post_tags(instance, instance._loaded_category)
+    # After the commit, or a page loaded in between would be stored as current
+    transaction.on_commit(lambda: bump('post', *tags), using=using)
+    instance._loaded_category = instance.category_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_fragments(sender, instance, using=None, **kwargs):
+    """Expire fragments and the post page that show comments"""
+    post_id = instance.post_id
+    transaction.on_commit(lambda: bump('comment', f'post:{post_id}'), using=using)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_fragments(sender, instance, using=None, **kwargs):
+    """Expire fragments and pages that show category names"""
+    category_id = instance.pk
+    transaction.on_commit(lambda: bump('category', f'category:{category_id}'), using=using)
@@ -0,0 +1,176 @@
+"""
+Production static files: hashed names, precompressed variants and a WSGI
+handler that serves them without going through Django.
+
+``CompressedManifestStaticFilesStorage`` is ``ManifestStaticFilesStorage``
+(content-hashed names such as ``blog.3f2a9c1d.css`` plus a manifest the
+``{% static %}`` tag reads) that also writes ``.gz`` and, when the
+``brotli`` package is installed, ``.br`` copies of text assets at
+``collectstatic`` time. Compression happens once per deploy, not per
+request.
+
+``StaticFilesApplication`` wraps the WSGI application. It indexes
+``STATIC_ROOT`` once at startup and answers GET/HEAD requests under
+``STATIC_URL`` directly. It picks the smallest variant the client accepts
+and hands the file to the server's ``wsgi.file_wrapper`` (sendfile under
+gunicorn). Hashed names never change content, so they are sent with
+``Cache-Control: immutable`` and a one-year max-age. Other files get a
+short max-age. Every variant has its own ETag, since the plain, ``.gz``
+and ``.br`` bodies differ. Everything else, and unknown static paths, go
+to Django as usual.
+"""
+
+import gzip
+import json
+import mimetypes
+import os
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.utils.http import parse_etags
+
+from .compression import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE = {'.css', '.js', '.mjs', '.map', '.svg', '.txt', '.html', '.json', '.xml', '.ico', '.ttf', '.eot'}
+# Smaller files gain nothing from compression
+MIN_COMPRESS_SIZE = 512
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+SHORT_LIVED = 'public, max-age=60'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress(path):
+    """Write .gz (and .br) next to ``path`` when they are noticeably smaller"""
+    data = path.read_bytes()
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data) * 0.95:
+            path.with_name(path.name + suffix).write_bytes(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            path = Path(self.path(name))
+            if (
+                path.suffix.lower() in COMPRESSIBLE
+                and path.is_file()
+                and path.stat().st_size >= MIN_COMPRESS_SIZE
+            ):
+                compress(path)
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        # Each variant is a different byte sequence, so each gets its own
+        # strong ETag, made from its own size and mtime.
+        self.variants = {}
+        for encoding, suffix in (*ENCODINGS, (None, '')):
+            variant = Path(str(path) + suffix)
+            if variant.is_file():
+                stat = variant.stat()
+                coding = f'-{encoding}' if encoding else ''
+                etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}{coding}"'
+                self.variants[encoding] = (str(variant), stat.st_size, etag)
+        self.content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type in ('application/javascript', 'image/svg+xml'):
+            self.content_type += '; charset=utf-8'
+        self.cache_control = IMMUTABLE if immutable else SHORT_LIVED
+
+    @staticmethod
+    def matches(if_none_match, etag):
+        """Weak comparison of ``etag`` with the ETags of an If-None-Match header"""
+        etags = parse_etags(if_none_match)
+        return '*' in etags or any(tag.removeprefix('W/') == etag for tag in etags)
+
+    def choose(self, accept_encoding):
+        """(encoding, path, size, etag) of the variant to send"""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return (encoding, *self.variants[encoding])
+        return (None, *self.variants[None])
+
+
+def index_static_root(root, manifest_name='staticfiles.json'):
+    """``{relative name: StaticFile}`` for the files under ``root``"""
+    root = Path(root)
+    if not root.is_dir():
+        return {}
+    hashed = set()
+    manifest = root / manifest_name
+    if manifest.is_file():
+        hashed = set(json.loads(manifest.read_text()).get('paths', {}).values())
+
+    files = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(directory, filename)
+            if path.suffix in ('.gz', '.br') and path.with_suffix('').is_file():
+                continue
+            name = path.relative_to(root).as_posix()
+            files[name] = StaticFile(path, immutable=name in hashed)
+    return files
+
+
+class StaticFilesApplication:
+    """WSGI middleware serving STATIC_ROOT ahead of Django"""
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.prefix = urlsplit(prefix or settings.STATIC_URL).path
+        if not self.prefix.startswith('/'):
+            self.prefix = '/' + self.prefix
+        self.files = index_static_root(root or settings.STATIC_ROOT)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix) or environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+        static_file = self.files.get(path[len(self.prefix):])
+        if static_file is None:
+            return self.application(environ, start_response)
+        return self.serve(static_file, environ, start_response)
+
+    def serve(self, static_file, environ, start_response):
+        encoding, filename, size, etag = static_file.choose(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        headers = [
+            ('Cache-Control', static_file.cache_control),
+            ('ETag', etag),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if static_file.matches(environ.get('HTTP_IF_NONE_MATCH', ''), etag):
+            start_response('304 Not Modified', headers)
+            return []
+
+        headers += [('Content-Type', static_file.content_type), ('Content-Length', str(size))]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file = open(filename, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(file, 64 * 1024)
+        return _iter_file(file)
+
+
+def _iter_file(file, block_size=64 * 1024):
+    with file:
+        while chunk := file.read(block_size):
+            yield chunk
@@ -1,3 +1,1210 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import importlib
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import QuerySet, Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+from django.utils import timezone
+from django.utils.html import linebreaks
+
+from blog_project import urls as project_urls
+
+from . import urls as blog_urls
+from . import (
+    benchmark, comment_queue, compression, counters, datagen, middleware, moderation, rankings, related, routers,
+    search, views,
+)
+from .cache import bump
+from .models import Category, Comment, CommentSubmission, Post
+from .pagination import KeysetPaginator, encode_cursor
+from .staticfiles import IMMUTABLE, SHORT_LIVED, StaticFilesApplication
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0)
+class PostDetailQueryTests(TestCase):
+    """post_detail loads everything it renders in a fixed number of queries"""
+
+    # The post with its counts, its approved comments and its related posts.
+    QUERY_BUDGET = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='secret')
+        cls.category = Category.objects.create(name='Django')
+        cls.post = Post.objects.create(
+            title='Query budgets', content='Counting queries.',
+            author=cls.author, category=cls.category,
+        )
+        for i in range(4):
+            Post.objects.create(
+                title=f'Related {i}', content='More posts on counting queries.',
+                author=cls.author, category=cls.category,
+            )
+        cls.commenters = [User.objects.create_user(f'reader{i}') for i in range(5)]
+        for user in cls.commenters:
+            Comment.objects.create(post=cls.post, author=user, content='Nice post', moderation_status='approved')
+        Comment.objects.create(
+            post=cls.post, author=cls.author, content='Hidden', moderation_status='rejected'
+        )
+        # Without it every post would share "counting queries", too common a
+        # phrase to relate anything.
+        Post.objects.create(title='Elsewhere', content='Nothing in common.', author=cls.commenters[0])
+        related.build()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_query_budget(self):
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Comments (5)')
+        self.assertContains(response, '5 posts')
+        self.assertEqual(len(response.context['related_posts']), 3)
+
+    def test_query_budget_does_not_grow_with_comments(self):
+        for user in self.commenters:
+            Comment.objects.create(post=self.post, author=user, content='Again', moderation_status='approved')
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(self.post.get_absolute_url())
+        self.assertContains(response, 'Comments (10)')
+
+
+class CategoryCountTests(TestCase):
+    """Category.published_post_count follows posts as they are saved and deleted"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author')
+        cls.news = Category.objects.create(name='News', slug='news')
+        cls.tips = Category.objects.create(name='Tips', slug='tips')
+
+    def assertCounts(self, news, tips):
+        counts = dict(Category.objects.values_list('slug', 'published_post_count'))
+        self.assertEqual(counts, {'news': news, 'tips': tips})
+
+    def test_counts_follow_create_recategorise_unpublish_and_delete(self):
+        post = Post.objects.create(title='Counted', content='One.', author=self.author, category=self.news)
+        Post.objects.create(title='Draft', content='Two.', author=self.author, category=self.tips, published=False)
+        self.assertCounts(1, 0)
+
+        post = Post.objects.get(pk=post.pk)
+        post.category = self.tips
+        post.save()
+        self.assertCounts(0, 1)
+
+        post.published = False
+        post.save(update_fields=['published'])
+        self.assertCounts(0, 0)
+        post.published = True
+        post.save()
+        self.assertCounts(0, 1)
+
+        # Saves that touch neither field leave the counts alone
+        post.title = 'Renamed'
+        post.save(update_fields=['title'])
+        self.assertCounts(0, 1)
+
+        Post.objects.get(pk=post.pk).delete()
+        self.assertCounts(0, 0)
+
+    def test_recount_categories_repairs_drift(self):
+        Post.objects.create(title='Counted', content='One.', author=self.author, category=self.news)
+        Category.objects.update(published_post_count=7)
+        call_command('recount_categories', stdout=StringIO())
+        self.assertCounts(1, 0)
+
+
+class PostRenderingTests(TestCase):
+    """The excerpt and HTML of a post are stored on save and can be backfilled"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author')
+
+    def test_rendered_on_save(self):
+        content = ' '.join(f'word{i}' for i in range(40)) + '\n\n<b>bold</b> & more'
+        post = Post.objects.create(title='Rendered', content=content, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, ' '.join(f'word{i}' for i in range(30)) + ' …')
+        self.assertEqual(post.content_html, linebreaks(content, autoescape=True))
+        self.assertIn('&lt;b&gt;bold&lt;/b&gt; &amp; more', post.content_html)
+
+    def test_update_fields_content_writes_the_derived_fields(self):
+        post = Post.objects.create(title='Rendered', content='Before.', author=self.author)
+        post.content = 'After.'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual((post.excerpt, post.content_html), ('After.', '<p>After.</p>'))
+
+        # Saves that leave content alone do not re-render it
+        Post.objects.filter(pk=post.pk).update(excerpt='stale')
+        post.title = 'Renamed'
+        post.save(update_fields=['title'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'stale')
+
+    def test_backfill_post_rendering(self):
+        rendered = Post.objects.create(title='Rendered', content='Kept.', author=self.author)
+        missing = Post.objects.create(title='Missing', content='Filled.', author=self.author)
+        Post.objects.filter(pk=missing.pk).update(excerpt='', content_html='')
+        Post.objects.filter(pk=rendered.pk).update(content_html='<p>stale</p>')
+
+        out = StringIO()
+        call_command('backfill_post_rendering', only_missing=True, stdout=out)
+        self.assertIn('Rendered 1 posts', out.getvalue())
+        self.assertEqual(Post.objects.get(pk=missing.pk).content_html, '<p>Filled.</p>')
+        self.assertEqual(Post.objects.get(pk=rendered.pk).content_html, '<p>stale</p>')
+
+        call_command('backfill_post_rendering', batch_size=1, stdout=out)
+        self.assertEqual(Post.objects.get(pk=rendered.pk).content_html, '<p>Kept.</p>')
+
+
+class SearchTests(TestCase):
+    """Ranked full-text search over title, content and author, kept in sync on save and delete"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.margaret = User.objects.create_user('margaret')
+        author = User.objects.create_user('author')
+        cls.database_post = Post.objects.create(
+            title='Optimising databases', content='Indexes and query plans.', author=author
+        )
+        cls.garden = Post.objects.create(title='Spring garden', content='Tomatoes - and basil.', author=cls.margaret)
+
+    def search(self, query):
+        return list(search.search_posts(Post.objects.all(), query))
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('optim'), [self.database_post])
+        self.assertEqual(self.search('OPTIM datab'), [self.database_post])
+        self.assertEqual(self.search('timising'), [])
+
+    def test_author_name_matches(self):
+        self.assertEqual(self.search('margaret'), [self.garden])
+
+    def test_operators_and_punctuation_are_plain_text(self):
+        for query in ('"', '*', '-', '"*', '(', 'title:'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [])
+        # Operators are searched as words, never applied
+        self.assertEqual(self.search('tomatoes AND'), [self.garden])
+        self.assertEqual(self.search('basil -tomatoes'), [self.garden])
+        self.assertEqual(self.search('basil OR indexes'), [])
+        self.assertEqual(self.search('"spring garden'), [self.garden])
+        self.assertEqual(self.search('garden NEAR'), [])
+
+    def test_empty_query(self):
+        for query in ('', '   ', '\t\n'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.database_post.title = 'Tuning storage engines'
+        self.database_post.save()
+        self.assertEqual(self.search('optimising'), [])
+        self.assertEqual(self.search('engines'), [self.database_post])
+
+        self.database_post.delete()
+        self.assertEqual(self.search('engines'), [])
+        self.assertEqual(self.search('indexes'), [])
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0, BLOG_VIEW_COUNT_FLUSH_INTERVAL=0)
+    def test_home_page_search(self):
+        response = self.client.get(reverse('blog:home'), {'search': 'optim'})
+        self.assertEqual(list(response.context['page_obj']), [self.database_post])
+
+
+@override_settings(BLOG_MODERATION_KEYWORDS=['casino', 'cheap pills', 'cheap loans'])
+class ModerationTests(TestCase):
+    """moderate_comments decides pending comments by their combined rule scores"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author')
+        cls.reader = User.objects.create_user('reader')
+        cls.post = Post.objects.create(title='Moderation', content='Rules.', author=cls.author)
+
+    def comment(self, content, author=None):
+        return Comment.objects.create(post=self.post, author=author or self.reader, content=content)
+
+    def test_rules_decide_pending_comments(self):
+        fine = self.comment('Nice post, thanks for writing it up.')
+        double = self.comment('nice post,  THANKS for writing it up.')
+        links = self.comment('See http://a.example http://b.example http://c.example')
+        spam = self.comment('Cheap   pills and a casino bonus')
+        inactive = User.objects.create_user('gone', is_active=False)
+        gone = self.comment('Hello', author=inactive)
+
+        outcomes = moderation.moderate_pending()
+
+        self.assertEqual(outcomes, {'approved': 1, 'held': 1, 'rejected': 3})
+        statuses = dict(Comment.objects.values_list('pk', 'moderation_status'))
+        self.assertEqual(statuses[fine.pk], 'approved')
+        self.assertEqual(statuses[double.pk], 'rejected')
+        self.assertEqual(statuses[links.pk], 'held')
+        self.assertEqual(statuses[spam.pk], 'rejected')
+        self.assertEqual(statuses[gone.pk], 'rejected')
+        self.assertEqual(list(Comment.objects.filter(approved=True)), [fine])
+        self.assertEqual(Comment.objects.get(pk=spam.pk).moderation_note, 'keywords')
+
+    def test_decisions_take_one_update_per_outcome(self):
+        readers = [User.objects.create_user(f'reader{i}') for i in range(10)]
+        for i in range(50):
+            self.comment(f'Comment number {i}, long enough to be checked for copies.', author=readers[i % 10])
+        self.comment('casino')
+        # Claim, four rule lookups and one UPDATE per outcome, in a savepoint
+        with self.assertNumQueries(9):
+            outcomes = moderation.moderate_pending()
+        self.assertEqual(outcomes, {'approved': 50, 'held': 1})
+        self.assertFalse(Comment.objects.filter(moderation_status='pending').exists())
+
+    def test_keyword_pattern_matches_whole_words_and_phrases(self):
+        pattern = moderation.keyword_pattern(('cat', 'catalog', 'cheap pills'))
+        self.assertEqual(pattern.findall('A Catalog, a cat and CHEAP\npills'), ['Catalog', 'cat', 'CHEAP\npills'])
+        self.assertEqual(pattern.findall('concatenate cats'), [])
+
+
+class CommentQueueTests(TestCase):
+    """process_comment_queue publishes submissions in moderated batches with one purge each"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author')
+        cls.reader = User.objects.create_user('reader')
+        cls.posts = [Post.objects.create(title=f'Queued {i}', content='Queue.', author=cls.author) for i in range(2)]
+
+    def test_batches_are_taken_in_order(self):
+        for i in range(5):
+            comment_queue.enqueue(self.posts[i % 2], self.reader, f'Comment {i}')
+        with mock.patch.object(comment_queue, 'bump') as purge:
+            self.assertEqual(comment_queue.process(batch_size=3), 3)
+            self.assertEqual(CommentSubmission.objects.count(), 2)
+            self.assertEqual(comment_queue.process(batch_size=3), 2)
+            self.assertEqual(comment_queue.process(batch_size=3), 0)
+        self.assertEqual(list(Comment.objects.order_by('pk').values_list('content', flat=True)), [
+            f'Comment {i}' for i in range(5)
+        ])
+        # One purge per batch, never one per comment
+        self.assertEqual(purge.call_count, 2)
+        self.assertEqual(set(purge.call_args_list[0].args), {'comment', *(f'post:{p.pk}' for p in self.posts)})
+
+    def test_double_submission_is_rejected(self):
+        comment_queue.enqueue(self.posts[0], self.reader, 'Great read!')
+        comment_queue.enqueue(self.posts[0], self.reader, 'great   READ!')
+        comment_queue.process()
+        self.assertEqual(list(Comment.objects.order_by('pk').values_list('moderation_status', flat=True)), [
+            'approved', 'rejected'
+        ])
+
+    def test_only_approved_comments_purge_their_post(self):
+        comment_queue.enqueue(self.posts[0], self.reader, 'Fine')
+        comment_queue.enqueue(self.posts[1], User.objects.create_user('gone', is_active=False), 'Hidden')
+        with mock.patch.object(comment_queue, 'bump') as purge:
+            comment_queue.process()
+        purge.assert_called_once_with('comment', f'post:{self.posts[0].pk}')
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0)
+class ViewCounterTests(TestCase):
+    """Buffered views reach the database once, whatever happens during a flush"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author')
+        cls.post = Post.objects.create(title='Counted', content='Views.', author=author)
+        cls.other = Post.objects.create(title='Also counted', content='Views.', author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def view_count(self, post):
+        return Post.objects.values_list('view_count', flat=True).get(pk=post.pk)
+
+    def test_flush_moves_pending_views_to_the_database(self):
+        for _ in range(3):
+            counters.record_view(self.post.pk)
+        counters.record_view(self.other.pk)
+        self.assertEqual(counters.pending_views([self.post.pk, self.other.pk]), {self.post.pk: 3, self.other.pk: 1})
+
+        self.assertEqual(counters.flush(), 4)
+        self.assertEqual(counters.pending_views([self.post.pk, self.other.pk]), {})
+        self.assertEqual((self.view_count(self.post), self.view_count(self.other)), (3, 1))
+        self.assertEqual(counters.flush(), 0)
+        self.assertEqual(self.view_count(self.post), 3)
+
+    def test_list_pages_show_buffered_views(self):
+        for _ in range(3):
+            counters.record_view(self.post.pk)
+        self.assertContains(self.client.get(reverse('blog:home')), '3 views')
+        self.client.force_login(self.post.author)
+        self.assertContains(self.client.get(reverse('blog:my_posts')), '3 views')
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_cached_cards_show_the_bucketed_count(self):
+        Post.objects.filter(pk=self.post.pk).update(view_count=1234)
+        self.assertContains(self.client.get(reverse('blog:home')), '1200+ views')
+        # Within the bucket the cached card is reused, and it never claims an exact count
+        counters.record_view(self.post.pk)
+        response = self.client.get(reverse('blog:home'))
+        self.assertContains(response, '1200+ views')
+        self.assertNotContains(response, '1235 views')
+        Post.objects.filter(pk=self.post.pk).update(view_count=1299)
+        self.assertContains(self.client.get(reverse('blog:home')), '1300+ views')
+
+    def test_view_recorded_during_a_flush_stays_buffered(self):
+        counters.record_view(self.post.pk)
+        update = QuerySet.update
+
+        def update_while_viewed(queryset, **kwargs):
+            counters.record_view(self.post.pk)
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update_while_viewed):
+            self.assertEqual(counters.flush(), 1)
+        self.assertEqual(counters.pending_views([self.post.pk]), {self.post.pk: 1})
+        self.assertEqual(counters.flush(), 1)
+        self.assertEqual(self.view_count(self.post), 2)
+
+    def test_delta_evicted_during_a_flush_is_not_counted_twice(self):
+        counters.record_view(self.post.pk)
+        counters.record_view(self.other.pk)
+        update = QuerySet.update
+
+        def update_then_evict(queryset, **kwargs):
+            cache.delete(counters.DELTA_KEY % self.post.pk)
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update_then_evict):
+            self.assertEqual(counters.flush(), 2)
+        self.assertEqual(counters.flush(), 0)
+        self.assertEqual((self.view_count(self.post), self.view_count(self.other)), (1, 1))
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0)
+class RelatedPostsPurgeTests(TestCase):
+    """Re-scoring a post purges the pages whose related lists changed, and only those"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author')
+        gardener = User.objects.create_user('gardener')
+        code = Category.objects.create(name='Code')
+        garden = Category.objects.create(name='Garden')
+        cls.posts = [
+            Post.objects.create(
+                title=f'Caching querysets {i}', content='Caching querysets and templates keeps pages fast.',
+                author=cls.author, category=code,
+            )
+            for i in range(3)
+        ]
+        cls.garden = [
+            Post.objects.create(
+                title=f'Growing tomatoes {i}', content='Tomatoes want sunny soil and patient watering.',
+                author=gardener, category=garden,
+            )
+            for i in range(3)
+        ]
+        related.build()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unrelated_edit_keeps_other_pages_cached(self):
+        url = self.posts[0].get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.garden[0].content += ' Mulch helps.'
+            self.garden[0].save()
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_rewritten_related_list_purges_the_page(self):
+        url = self.garden[0].get_absolute_url()
+        self.assertNotContains(self.client.get(url), 'Watering tomatoes')
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(
+                title='Watering tomatoes', content='Patient watering of tomatoes in sunny soil.',
+                author=self.author,
+            )
+        self.assertContains(self.client.get(url), 'Watering tomatoes')
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0)
+class PageCacheTests(TestCase):
+    """Anonymous pages are served from the cache until something they show changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author')
+        cls.category = Category.objects.create(name='Cached')
+        cls.post = Post.objects.create(
+            title='Cached page', content='Served from the cache.', author=cls.author, category=cls.category,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_edit_purges_the_cached_page(self):
+        url = self.post.get_absolute_url()
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), 'Cached page')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Edited page'
+            self.post.save()
+        self.assertContains(self.client.get(url), 'Edited page')
+
+    def test_new_post_purges_the_cached_category_page(self):
+        url = reverse('blog:category_posts', args=[self.category.slug])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Newcomer', content='Also cached.', author=self.author, category=self.category)
+        self.assertContains(self.client.get(url), 'Newcomer')
+
+    def test_page_loaded_during_a_write_is_not_stored(self):
+        url = self.post.get_absolute_url()
+        load = views.get_object_or_404
+
+        def load_while_saved(*args, **kwargs):
+            post = load(*args, **kwargs)
+            bump('post', f'post:{post.pk}')  # a save committed after the load
+            return post
+
+        with mock.patch.object(views, 'get_object_or_404', load_while_saved):
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertTrue(queries.captured_queries, 'the stale page was served from the cache')
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0, BLOG_PAGE_CACHE_TIMEOUT=0)
+class ConditionalGetTests(TestCase):
+    """Post and list pages answer 304 until something they show changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author')
+        cls.category = Category.objects.create(name='Validators')
+        cls.post = Post.objects.create(
+            title='Revalidated', content='ETags all the way.', author=cls.author, category=cls.category,
+        )
+
+    def urls(self):
+        return [
+            reverse('blog:home'),
+            self.post.get_absolute_url(),
+            reverse('blog:category_posts', args=[self.category.slug]),
+        ]
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_matching_etag_answers_304(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag = self.etag(url)
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_etag_is_stable_while_generations_are_seeded(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertEqual(self.etag(url), self.etag(url))
+
+    def test_new_comment_changes_the_post_etag(self):
+        url = self.post.get_absolute_url()
+        etag = self.etag(url)
+        Comment.objects.create(post=self.post, author=self.author, content='Fresh', moderation_status='approved')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_edit_changes_every_etag(self):
+        etags = [self.etag(url) for url in self.urls()]
+        self.post.title = 'Revalidated again'
+        self.post.save()
+        for url, etag in zip(self.urls(), etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursors walk the listing forwards and backwards; bad cursors give the first page"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author')
+        now = timezone.now()
+        for i in range(12):
+            post = Post.objects.create(title=f'Post {i}', content='Paged.', author=author)
+            # Two posts share each timestamp, so ties are broken by id
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(minutes=i // 2))
+        cls.newest_first = list(Post.objects.order_by('-created_at', '-id'))
+
+    def paginator(self):
+        return KeysetPaginator(Post.objects.all(), 5, count_timeout=0)
+
+    def test_next_previous_and_last_cursors(self):
+        first = self.paginator().get_page()
+        self.assertEqual((first.number, list(first)), (1, self.newest_first[:5]))
+        self.assertFalse(first.has_previous())
+
+        second = self.paginator().get_page(first.next_cursor)
+        self.assertEqual((second.number, list(second)), (2, self.newest_first[5:10]))
+        self.assertTrue(second.has_next() and second.has_previous())
+
+        back = self.paginator().get_page(second.previous_cursor)
+        self.assertEqual((back.number, list(back)), (1, self.newest_first[:5]))
+        self.assertFalse(back.has_previous())
+
+        last = self.paginator().get_page(first.last_cursor)
+        self.assertEqual((last.number, list(last)), (3, self.newest_first[10:]))
+        self.assertFalse(last.has_next())
+        self.assertEqual(list(self.paginator().get_page(last.previous_cursor)), self.newest_first[5:10])
+
+    def test_invalid_cursors_give_the_first_page(self):
+        post = self.newest_first[0]
+        created_at = post.created_at.isoformat()
+
+        def raw(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+        cursors = [
+            'not a cursor', raw('next'), raw(['next', 2, None]), raw(['next', 2, ['yesterday', 1]]),
+            raw(['next', 2, [created_at, 2 ** 70]]), raw(['next', 2, [created_at, -1]]),
+            raw(['next', 2 ** 70, [created_at, post.pk]]), raw(['next', 1e400, [created_at, post.pk]]),
+            raw(['sideways', 2, [created_at, post.pk]]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                page = self.paginator().get_page(cursor)
+                self.assertEqual((page.number, list(page)), (1, self.newest_first[:5]))
+
+    @override_settings(BLOG_PAGINATION='keyset', BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_overflowing_cursor_is_not_a_server_error(self):
+        cursor = encode_cursor('next', 2, Post(pk=2 ** 70, created_at=timezone.now()))
+        response = self.client.get(reverse('blog:home'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0)
+class WarmupCommandTests(TestCase):
+    """manage.py warmup primes the process and compares first requests of fresh processes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author')
+        category = Category.objects.create(name='Warm', slug='warm')
+        Post.objects.create(title='Warm post', content='Boot.', author=author, category=category)
+
+    def test_warm_up_steps(self):
+        out = StringIO()
+        call_command('warmup', stdout=out)
+        self.assertIn('templates', out.getvalue())
+        self.assertIn('Warmed up in', out.getvalue())
+
+    def test_first_request(self):
+        out = StringIO()
+        call_command('warmup', first_request=reverse('blog:home'), stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(set(result), {'warmup_ms', 'first_ms', 'second_ms'})
+        self.assertGreater(result['warmup_ms'], 0)
+
+        call_command('warmup', first_request=reverse('blog:home'), cold=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue().splitlines()[-1])['warmup_ms'], 0)
+
+    def test_compare_spawns_manage_py(self):
+        result = json.dumps({'warmup_ms': 1.0, 'first_ms': 2.0, 'second_ms': 3.0})
+        completed = mock.Mock(stdout=result + '\n')
+        out = StringIO()
+        with mock.patch('subprocess.run', return_value=completed) as run:
+            call_command('warmup', compare=True, runs=1, stdout=out, stderr=StringIO())
+        # One throwaway, one cold and one warm process per page
+        self.assertEqual(run.call_count, 9)
+        command = run.call_args_list[1].args[0]
+        self.assertEqual(command[:3], [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'warmup'])
+        self.assertEqual(command[-1], '--cold')
+        self.assertIn('post_detail', out.getvalue())
+
+
+@contextmanager
+def async_read_views():
+    """Serve the read-only pages with blog.async_views, as BLOG_ASYNC_VIEWS does when blog.urls is imported"""
+    with override_settings(BLOG_ASYNC_VIEWS=True):
+        _reload_urls()
+    try:
+        yield
+    finally:
+        _reload_urls()
+
+
+def _reload_urls():
+    # The project URLconf's include() keeps the patterns it resolved first
+    importlib.reload(blog_urls)
+    importlib.reload(project_urls)
+    clear_url_caches()
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0, BLOG_PAGE_CACHE_TIMEOUT=0)
+class AsyncViewTests(TestCase):
+    """The async read-only views answer like their sync counterparts"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author')
+        cls.category = Category.objects.create(name='Async', slug='async')
+        cls.posts = [
+            Post.objects.create(
+                title=f'Async post {i}', content=f'Event loops and threads {i}.', author=author,
+                category=cls.category, featured=i == 0,
+            )
+            for i in range(8)
+        ]
+        cls.post = cls.posts[0]
+        Comment.objects.create(post=cls.post, author=author, content='Awaited', moderation_status='approved')
+        Comment.objects.create(post=cls.post, author=author, content='Hidden', moderation_status='rejected')
+        related.build()
+
+    def get_both(self, url, **headers):
+        """The sync and the async response to ``url``"""
+        sync = self.client.get(url, **headers)
+        with async_read_views():
+            response = async_to_sync(self.async_client.get)(url, **headers)
+            # Resolved lazily, so before the sync views are restored
+            self.assertTrue(asyncio.iscoroutinefunction(response.resolver_match.func))
+        return sync, response
+
+    def assertSameContext(self, sync, response, *names):
+        self.assertEqual((sync.status_code, response.status_code), (200, 200))
+        for name in names:
+            with self.subTest(name=name):
+                self.assertEqual(list(response.context[name]), list(sync.context[name]))
+
+    def test_home(self):
+        sync, response = self.get_both(reverse('blog:home'))
+        self.assertSameContext(sync, response, 'page_obj', 'featured_posts', 'categories')
+        sync, response = self.get_both(reverse('blog:home'), query_params={'page': 2})
+        self.assertSameContext(sync, response, 'page_obj')
+
+    def test_post_detail(self):
+        sync, response = self.get_both(self.post.get_absolute_url())
+        self.assertSameContext(sync, response, 'comments', 'related_posts')
+        self.assertEqual(response.context['post'], self.post)
+        self.assertContains(response, 'Awaited')
+        self.assertNotContains(response, 'Hidden')
+
+    def test_category_posts(self):
+        sync, response = self.get_both(reverse('blog:category_posts', args=[self.category.slug]))
+        self.assertSameContext(sync, response, 'page_obj')
+        self.assertEqual(response.context['category'], self.category)
+
+    def test_missing_pages_are_404(self):
+        for url in (reverse('blog:post_detail', args=['missing']), reverse('blog:category_posts', args=['missing'])):
+            with self.subTest(url=url):
+                sync, response = self.get_both(url)
+                self.assertEqual((sync.status_code, response.status_code), (404, 404))
+
+    def test_conditional_get(self):
+        for url in (
+            reverse('blog:home'), self.post.get_absolute_url(),
+            reverse('blog:category_posts', args=[self.category.slug]),
+        ):
+            with self.subTest(url=url):
+                sync, response = self.get_both(url)
+                self.assertEqual(response['ETag'], sync['ETag'])
+                _, response = self.get_both(url, headers={'If-None-Match': sync['ETag']})
+                self.assertEqual(response.status_code, 304)
+
+
+class CompressionTests(SimpleTestCase):
+    """Minification keeps significant whitespace; compression honours q-values, streams and pads gzip"""
+
+    def compress(self, response, accept='gzip', **meta):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept, **meta)
+        middleware = compression.ResponseCompressionMiddleware(lambda request: response)
+        return middleware(request)
+
+    def test_minify_html_preserves_pre_textarea_and_script(self):
+        html = (
+            '<div>\n    <!-- note -->\n    <p>a   b</p>\n</div>'
+            '<pre>  keep\n    this</pre><textarea>\n  typed  </textarea>'
+            '<script>if (a  <  b) {\n    go();\n}</script><!--[if IE]>ie<![endif]-->'
+        )
+        self.assertEqual(compression.minify_html(html), (
+            '<div>\n<p>a b</p>\n</div>'
+            '<pre>  keep\n    this</pre><textarea>\n  typed  </textarea>'
+            '<script>if (a  <  b) {\n    go();\n}</script><!--[if IE]>ie<![endif]-->'
+        ))
+
+    def test_choose_encoding_q_values(self):
+        cases = {
+            '': None,
+            'gzip': 'gzip',
+            'GZIP;q=0.5, identity': 'gzip',
+            'gzip;q=0': None,
+            'gzip;q=nonsense': None,
+            '*': 'gzip',
+            '*;q=0.3, gzip;q=0': None,
+            'deflate, identity': None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header), mock.patch.object(compression, 'brotli', None):
+                self.assertEqual(compression.choose_encoding(header), expected)
+        with mock.patch.object(compression, 'brotli', object()):
+            self.assertEqual(compression.choose_encoding('gzip, br'), 'br')
+            self.assertEqual(compression.choose_encoding('gzip, br;q=0.5'), 'gzip')
+            self.assertEqual(compression.choose_encoding('gzip, br', allow_brotli=False), 'gzip')
+
+    def test_streaming_response_is_compressed_per_chunk(self):
+        chunks = [b'<p>%d</p>' % i * 50 for i in range(3)]
+        response = StreamingHttpResponse(iter(chunks), content_type='text/html')
+        response = self.compress(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        parts = list(response.streaming_content)
+        self.assertEqual(len(parts), len(chunks) + 1)
+        # Every chunk is flushed, so the prefix decodes on its own
+        decoder = compression.zlib.decompressobj(31)
+        self.assertEqual(decoder.decompress(parts[0]), chunks[0])
+        self.assertEqual(gzip.decompress(b''.join(parts)), b''.join(chunks))
+
+    def test_gzip_bodies_are_padded_to_random_lengths(self):
+        body = b'<p>secret</p>' * 200
+        sizes = set()
+        for _ in range(10):
+            response = self.compress(HttpResponse(body))
+            self.assertEqual(gzip.decompress(response.content), body)
+            sizes.add(len(response.content))
+        self.assertGreater(len(sizes), 1)
+
+    def test_csrf_responses_are_never_brotli(self):
+        with mock.patch.object(compression, 'brotli', object()):
+            response = self.compress(HttpResponse(b'<p>form</p>' * 200), accept='br, gzip', CSRF_COOKIE_USED=True)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0)
+class CachedPageCompressionTests(TestCase):
+    """BLOG_RESPONSE_ROUTES applies to pages served from the page cache too"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author')
+        for i in range(5):
+            Post.objects.create(title=f'Post {i}', content='Long enough to compress. ' * 20, author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(BLOG_RESPONSE_ROUTES={'blog:home': {'gzip_level': 0}})
+    def test_route_options_on_cache_hits(self):
+        for _ in range(2):
+            response = self.client.get(reverse('blog:home'), HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_cache_hits_are_compressed(self):
+        for _ in range(2):
+            response = self.client.get(reverse('blog:home'), HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0, BLOG_TRENDING_HALF_LIFE_HOURS=6, BLOG_RANKING_COMMENT_WEIGHT=5)
+class RankingTests(TestCase):
+    """Trending weighs views and comments by age; popular sums them"""
+
+    def test_compute_rankings_order(self):
+        author = User.objects.create_user('author')
+        older, viewed, discussed, rejected = (
+            Post.objects.create(title=title, content='Ranked.', author=author)
+            for title in ('Older', 'Viewed', 'Discussed', 'Rejected')
+        )
+        now = timezone.now()
+        # 100 views two half-lives ago are worth 25 today
+        Post.objects.filter(pk=older.pk).update(view_count=100)
+        self.assertEqual(rankings.compute(now=now - timedelta(hours=12)), 1)
+
+        Post.objects.filter(pk=viewed.pk).update(view_count=30)
+        for _ in range(4):  # 4 comments at weight 5 are worth 20 views
+            Comment.objects.create(post=discussed, author=author, content='Hm', moderation_status='approved')
+        Comment.objects.create(post=rejected, author=author, content='Spam', moderation_status='rejected')
+        rankings.compute(now=now)
+
+        self.assertEqual(list(rankings.trending()), [viewed, older, discussed])
+        self.assertEqual(list(rankings.popular()), [older, viewed, discussed])
+        self.assertEqual(rankings.compute(now=now), 0)
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0, BLOG_PAGE_CACHE_TIMEOUT=0, BLOG_PROFILING_SAMPLE_RATE=1)
+class QueryProfilingTests(TestCase):
+    """Sampled requests are logged with their queries; slow ones with each query's origin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author')
+        cls.post = Post.objects.create(title='Profiled', content='Measured.', author=author)
+
+    def get_logged(self, logger, level='INFO'):
+        with self.assertLogs(logger, level) as logs:
+            self.client.get(self.post.get_absolute_url())
+        return json.loads(logs.records[-1].getMessage())
+
+    @override_settings(BLOG_PROFILING_SLOW_MS=10 ** 6)
+    def test_profiled_request_record(self):
+        with self.assertNoLogs('blog.profiling.slow'):
+            record = self.get_logged('blog.profiling')
+        self.assertEqual((record['view'], record['status']), ('blog:post_detail', 200))
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('blog/post_detail.html', record['templates'])
+        self.assertNotIn('query_log', record)
+
+    @override_settings(BLOG_PROFILING_SLOW_MS=0)
+    def test_slow_request_logs_each_query(self):
+        record = self.get_logged('blog.profiling.slow', 'WARNING')
+        self.assertEqual(len(record['query_log']), record['queries'])
+        self.assertTrue(any(
+            (entry['location'] or '').startswith('blog/views.py:') for entry in record['query_log']
+        ))
+
+    @override_settings(BLOG_PROFILING_SAMPLE_RATE=0.25)
+    def test_sampling(self):
+        with mock.patch.object(middleware.random, 'random', return_value=0.5):
+            with self.assertNoLogs('blog.profiling'):
+                self.client.get(self.post.get_absolute_url())
+        with mock.patch.object(middleware.random, 'random', return_value=0.1):
+            self.get_logged('blog.profiling')
+
+    @override_settings(BLOG_PROFILING_SAMPLE_RATE=0)
+    def test_disabled_at_zero(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            middleware.QueryProfilingMiddleware(lambda request: None)
+
+    def test_in_lists_share_a_fingerprint(self):
+        one = middleware.fingerprint('SELECT 1 FROM t WHERE id IN (%s) AND a = %s')
+        many = middleware.fingerprint('SELECT 1 FROM t WHERE id IN (%s, %s, %s) AND a = %s')
+        self.assertEqual(one, many)
+        self.assertEqual(one, 'SELECT 1 FROM t WHERE id IN (%s, ...) AND a = %s')
+
+
+@override_settings(BLOG_READ_REPLICAS=['replica'], BLOG_REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Blog reads go to a replica only for safe requests from clients that have not just written"""
+
+    def route(self, request, status=200):
+        seen = {}
+
+        def view(request):
+            seen['post'] = routers.ReplicaRouter().db_for_read(Post)
+            seen['user'] = routers.ReplicaRouter().db_for_read(User)
+            return HttpResponse(status=status)
+
+        response = routers.ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_safe_requests_read_blog_models_from_a_replica(self):
+        seen, response = self.route(RequestFactory().get('/'))
+        self.assertEqual(seen, {'post': 'replica', 'user': 'default'})
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        # Outside a request, e.g. in workers, everything reads the primary
+        self.assertEqual(routers.ReplicaRouter().db_for_read(Post), 'default')
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        seen, response = self.route(RequestFactory().post('/'))
+        self.assertEqual(seen['post'], 'default')
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], 10)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        seen, _ = self.route(request)
+        self.assertEqual(seen['post'], 'default')
+
+    def test_failed_writes_do_not_pin(self):
+        _, response = self.route(RequestFactory().post('/'), status=500)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    async def test_async_requests(self):
+        async def view(request):
+            return HttpResponse(routers.ReplicaRouter().db_for_read(Post))
+
+        response = await routers.ReplicaRoutingMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'replica')
+
+    @override_settings(BLOG_READ_REPLICAS=[])
+    def test_unused_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            routers.ReplicaRoutingMiddleware(lambda request: None)
+
+
+class ConnectionSettingsTests(SimpleTestCase):
+    """Production connection settings follow the DB_POOL environment and the benchmark drops old pools"""
+
+    def production_settings(self, **environ):
+        keys = (
+            'DB_POOL', 'DB_POOL_MIN_SIZE', 'DB_POOL_MAX_SIZE', 'DB_POOL_TIMEOUT', 'DB_CONN_MAX_AGE', 'DB_REPLICA_HOSTS',
+        )
+        with mock.patch.dict(os.environ, {key: '' for key in keys}):
+            for key in keys:
+                del os.environ[key]
+            os.environ.update(environ)
+            sys.modules.pop('blog_project.settings_production', None)
+            try:
+                return importlib.import_module('blog_project.settings_production')
+            finally:
+                sys.modules.pop('blog_project.settings_production', None)
+
+    def test_persistent_connections_by_default(self):
+        database = self.production_settings().DATABASES['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('OPTIONS', database)
+
+    def test_pool(self):
+        production = self.production_settings(
+            DB_POOL='1', DB_POOL_MAX_SIZE='8', DB_POOL_TIMEOUT='2.5', DB_REPLICA_HOSTS='replica.internal',
+        )
+        database = production.DATABASES['default']
+        # Django refuses a pool together with persistent connections
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS'], {'pool': {'min_size': 1, 'max_size': 8, 'timeout': 2.5}})
+        self.assertEqual(production.DATABASES['replica1']['OPTIONS'], database['OPTIONS'])
+
+    def test_benchmark_closes_the_previous_pool(self):
+        from blog.management.commands.benchmark_connections import Command
+
+        pool = mock.Mock()
+        wrapper = type(connections['default'])
+        database = dict(connection.settings_dict)
+        with mock.patch.object(wrapper, '_connection_pools', {'default': pool}, create=True):
+            Command().use(database, dict(connection.settings_dict))
+            self.assertEqual(wrapper._connection_pools, {})
+        pool.close.assert_called_once_with()
+
+
+class StaticFilesApplicationTests(SimpleTestCase):
+    """STATIC_ROOT is served ahead of Django with the right variant and caching headers"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        root = Path(directory.name)
+        (root / 'blog').mkdir()
+        (root / 'blog' / 'site.0123abcd.css').write_bytes(b'body {}')
+        (root / 'blog' / 'site.0123abcd.css.gz').write_bytes(b'gz')
+        (root / 'blog' / 'site.0123abcd.css.br').write_bytes(b'b')
+        (root / 'robots.txt').write_bytes(b'User-agent: *')
+        (root / 'staticfiles.json').write_text(json.dumps({'paths': {'blog/site.css': 'blog/site.0123abcd.css'}}))
+        self.app = StaticFilesApplication(lambda environ, start_response: [b'django'], root=root, prefix='/static/')
+
+    def get(self, path, method='GET', **headers):
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, **headers}
+        response = {}
+
+        def start_response(status, headers):
+            response.update(headers, status=status)
+
+        response['body'] = b''.join(self.app(environ, start_response))
+        return response
+
+    def test_hashed_files_are_immutable(self):
+        response = self.get('/static/blog/site.0123abcd.css')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+        self.assertEqual(response['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual((response['body'], response['Content-Length']), (b'body {}', '7'))
+        self.assertEqual(self.get('/static/robots.txt')['Cache-Control'], SHORT_LIVED)
+
+    def test_precompressed_variants(self):
+        cases = {
+            'gzip, br': ('br', b'b'),
+            'gzip': ('gzip', b'gz'),
+            'br;q=0, gzip': ('gzip', b'gz'),
+            '*': ('br', b'b'),
+            'gzip;q=0, identity': (None, b'body {}'),
+            '': (None, b'body {}'),
+        }
+        for accept, (encoding, body) in cases.items():
+            with self.subTest(accept=accept):
+                response = self.get('/static/blog/site.0123abcd.css', HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual((response.get('Content-Encoding'), response['body']), (encoding, body))
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_if_none_match(self):
+        etag = self.get('/static/robots.txt')['ETag']
+        for header in (etag, f'"other", W/{etag}', '*'):
+            with self.subTest(header=header):
+                response = self.get('/static/robots.txt', HTTP_IF_NONE_MATCH=header)
+                self.assertEqual((response['status'], response['body']), ('304 Not Modified', b''))
+        for header in ('"other"', etag[:-2] + '"', f'"x{etag[1:]}'):
+            with self.subTest(header=header):
+                self.assertEqual(self.get('/static/robots.txt', HTTP_IF_NONE_MATCH=header)['status'], '200 OK')
+
+    def test_each_encoding_has_its_own_etag(self):
+        path = '/static/blog/site.0123abcd.css'
+        etags = {
+            accept: self.get(path, HTTP_ACCEPT_ENCODING=accept)['ETag'] for accept in ('', 'gzip', 'br')
+        }
+        self.assertEqual(len(set(etags.values())), 3)
+        self.assertTrue(etags['gzip'].endswith('-gzip"') and etags['br'].endswith('-br"'))
+        # Revalidating the plain file never answers for the gzip bytes, and vice versa
+        self.assertEqual(self.get(path, HTTP_IF_NONE_MATCH=etags['gzip'])['status'], '200 OK')
+        response = self.get(path, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etags[''])
+        self.assertEqual((response['status'], response['Content-Encoding']), ('200 OK', 'gzip'))
+        response = self.get(path, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etags['gzip'])
+        self.assertEqual((response['status'], response['ETag']), ('304 Not Modified', etags['gzip']))
+
+    def test_other_requests_reach_django(self):
+        self.assertEqual(self.get('/static/missing.css')['body'], b'django')
+        self.assertEqual(self.get('/static/robots.txt', method='POST')['body'], b'django')
+        self.assertEqual(self.get('/about/')['body'], b'django')
+        self.assertEqual(self.get('/static/robots.txt', method='HEAD')['body'], b'')
+
+
+class DataGenerationTests(TestCase):
+    """The synthetic data generator refuses impossible counts and restores auto_now"""
+
+    def test_comments_without_authors_or_posts(self):
+        with self.assertRaisesMessage(CommandError, 'Comments need authors'):
+            datagen.generate(comments=5)
+        User.objects.create_user('author')
+        with self.assertRaisesMessage(CommandError, 'Comments need posts'):
+            datagen.generate(comments=5)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_indexes_are_rebuilt_only_for_new_posts(self):
+        with (
+            mock.patch.object(datagen.search, 'rebuild') as search,
+            mock.patch.object(datagen.related, 'build') as related_build,
+        ):
+            datagen.generate(users=3, categories=2)
+            self.assertFalse(search.called or related_build.called)
+
+            call_command('populate_blog', posts=4, comments=5, skip_indexes=True, stdout=StringIO())
+            self.assertFalse(search.called or related_build.called)
+            counted = Category.objects.aggregate(total=Sum('published_post_count'))['total']
+            self.assertEqual(counted, Post.objects.filter(published=True, category__isnull=False).count())
+
+            datagen.generate(posts=2)
+            self.assertEqual((search.call_count, related_build.call_count), (1, 1))
+
+    def test_explicit_timestamps_restores_auto_now(self):
+        field = Post._meta.get_field('updated_at')
+        with self.assertRaises(RuntimeError):
+            with datagen.explicit_timestamps(Post):
+                self.assertFalse(field.auto_now)
+                raise RuntimeError
+        self.assertTrue(field.auto_now)
+
+
+@tag('benchmark')
+@override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0)
+class RouteBenchmarkTests(TestCase):
+    """
+    Query-count and latency regression checks for every route in blog.urls.
+    Only query counts are checked by default; BLOG_BENCH=1 also compares
+    latencies and prints the report. See blog/benchmark.py for
+    configuration; skip with --exclude-tag benchmark.
+    """
+
+    # Routes served from blog.pagecache to anonymous visitors
+    PAGE_CACHED = {'home', 'home_search', 'home_deep_page', 'post_detail', 'category_posts'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = benchmark.dataset_config()
+        benchmark.seed_dataset(**cls.dataset)
+        # Benchmark the busiest post so comment rendering is exercised.
+        cls.post = Post.objects.filter(
+            published=True, category__isnull=False
+        ).with_comment_counts().order_by('-approved_comment_count').first()
+        cls.author = cls.post.author
+
+    def routes(self):
+        post, category = self.post, self.post.category
+        deep = Post.objects.filter(published=True)[600]
+        deep_cursor = encode_cursor('next', 101, deep)
+        return [
+            ('home', None, reverse('blog:home')),
+            ('home_search', None, reverse('blog:home') + '?search=django+cache'),
+            ('home_deep_page', None, reverse('blog:home') + f'?cursor={deep_cursor}'),
+            ('post_detail', None, post.get_absolute_url()),
+            ('category_posts', None, reverse('blog:category_posts', args=[category.slug])),
+            ('register', None, reverse('blog:register')),
+            ('login', None, reverse('blog:login')),
+            ('logout', None, reverse('blog:logout')),
+            ('post_create', self.author, reverse('blog:post_create')),
+            ('post_edit', self.author, reverse('blog:post_edit', args=[post.slug])),
+            ('post_delete', self.author, reverse('blog:post_delete', args=[post.slug])),
+            ('add_comment', self.author, reverse('blog:add_comment', args=[post.slug])),
+            ('my_posts', self.author, reverse('blog:my_posts')),
+            ('category_create', self.author, reverse('blog:category_create')),
+        ]
+
+    def measure(self, user, url, repeat):
+        cache.clear()
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        return benchmark.measure(client, url, repeat)
+
+    def test_routes_against_baselines(self):
+        # Query counts are deterministic and always checked; timings depend
+        # on the machine, so they are only compared with BLOG_BENCH=1.
+        timed = os.environ.get('BLOG_BENCH') == '1'
+        update = os.environ.get('BLOG_BENCH_UPDATE') == '1'
+        repeat = benchmark.env_int('BLOG_BENCH_REPEAT', 20 if timed or update else 1)
+        threshold = float(os.environ.get('BLOG_BENCH_THRESHOLD', 0.5)) if timed else None
+
+        results = {}
+        for name, user, url in self.routes():
+            results[name] = self.measure(user, url, repeat)
+            self.assertLess(results[name]['status'], 400, f'{name} returned an error')
+        # Those pages were served by the page cache; time a full render too.
+        with override_settings(BLOG_PAGE_CACHE_TIMEOUT=0):
+            for name, user, url in self.routes():
+                if name in self.PAGE_CACHED:
+                    results[f'{name}_uncached'] = self.measure(user, url, repeat)
+        if timed or update:
+            sys.stderr.write('\n' + benchmark.report(results) + '\n')
+
+        if update:
+            benchmark.save_baselines(self.dataset, results)
+            return
+
+        baselines = benchmark.load_baselines()
+        if baselines.get('dataset') != self.dataset:
+            self.skipTest('No baselines recorded for this dataset size; run with BLOG_BENCH_UPDATE=1')
+
+        problems = []
+        for name, result in results.items():
+            baseline = baselines['routes'].get(name)
+            if baseline is not None:
+                problems += benchmark.regressions(name, result, baseline, threshold)
+        self.assertFalse(problems, 'Routes regressed:\n' + '\n'.join(problems))
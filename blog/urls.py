@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Read-only pages can be served by async views under ASGI
+if getattr(settings, 'BLOG_ASYNC_VIEWS', False):
+    from . import async_views as read_views
+else:
+    read_views = views
+
 app_name = 'blog'
 
 urlpatterns = [
-    path('', views.home, name='home'),
+    path('', read_views.home, name='home'),
     
     # CRUD operations - specific patterns first
     path('post/create/', views.post_create, name='post_create'),
@@ -13,11 +20,11 @@ urlpatterns = [
     path('post/<slug:slug>/comment/', views.add_comment, name='add_comment'),
     
     # Post detail - general pattern last
-    path('post/<slug:slug>/', views.post_detail, name='post_detail'),
+    path('post/<slug:slug>/', read_views.post_detail, name='post_detail'),
     
     # Category patterns - specific first
     path('category/create/', views.category_create, name='category_create'),
-    path('category/<slug:slug>/', views.category_posts, name='category_posts'),
+    path('category/<slug:slug>/', read_views.category_posts, name='category_posts'),
     
     # User-specific pages
     path('my-posts/', views.my_posts, name='my_posts'),
@@ -5,75 +5,127 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.urls import reverse
-from django.db import models
 from .models import Post, Category, Comment
 from .forms import PostForm, CommentForm, CategoryForm
-from django.core.paginator import Paginator
+from . import comment_queue, conditional, counters, pagecache, rankings, related, search
+from .cache import get_generations
+from .pagination import paginate
+
+# List pages render the stored excerpt, so they never need the full body.
+BODY_FIELDS = ('content', 'content_html')
+
+
+def save_comment(request, post, form):
+    """Save a valid comment form, or queue it when BLOG_COMMENT_QUEUE is on"""
+    if comment_queue.enabled():
+        comment_queue.enqueue(post, request.user, form.cleaned_data['content'])
+        messages.success(request, 'Thanks! Your comment will appear shortly.')
+        return
+    comment = form.save(commit=False)
+    comment.post = post
+    comment.author = request.user
+    comment.save()
+    messages.success(request, 'Thanks! Your comment will appear once it has been moderated.')
+
+
+def home_validator(request, page_obj):
+    """Conditional GET validator over the page's posts and the sidebar generations"""
+    updated = [post.updated_at for post in page_obj]
+    return conditional.Validator(
+        request, [post.pk for post in page_obj], updated,
+        get_generations(['post', 'category', 'ranking']),
+        last_modified=updated,
+    )
+
+
+def post_validator(request, post):
+    """Conditional GET validator over the post, its approved comments and its page tags"""
+    return conditional.Validator(
+        request, post.updated_at, post.last_comment_at, post.approved_comment_count,
+        post.author_post_count, sorted(get_generations(pagecache.post_tags(post)).items()),
+        last_modified=[post.updated_at, post.last_comment_at],
+    )
+
+
+def category_validator(request, category, page_obj):
+    """Conditional GET validator over the category and the page's posts"""
+    updated = [post.updated_at for post in page_obj]
+    return conditional.Validator(
+        request, category.name, category.description, category.published_post_count,
+        [post.pk for post in page_obj], updated, last_modified=updated,
+    )
 
 
 def home(request):
     """Home page displaying all published posts"""
-    posts = Post.objects.filter(published=True).select_related('author', 'category')
+    pagecache.tag_page(request, 'post', 'category', 'ranking')
+    posts = Post.objects.filter(published=True).select_related('author', 'category').defer(*BODY_FIELDS)
     
     # Search functionality
     search_query = request.GET.get('search')
     if search_query:
-        posts = posts.filter(
-            models.Q(title__icontains=search_query) | 
-            models.Q(content__icontains=search_query) |
-            models.Q(author__username__icontains=search_query)
-        )
+        posts = search.search_posts(posts, search_query)
     
-    # Pagination
-    paginator = Paginator(posts, 6)  # Show 6 posts per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination (ranked search results cannot use keyset pagination)
+    page_obj = paginate(request, posts, 6, keyset=not search_query)  # Show 6 posts per page
+    
+    # Revalidate before loading the sidebars or rendering
+    validator = home_validator(request, page_obj)
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    page_obj.object_list = counters.attach_pending_views(page_obj.object_list)
     
     # Get featured posts for sidebar
-    featured_posts = Post.objects.filter(published=True, featured=True)[:3]
+    featured_posts = Post.objects.filter(published=True, featured=True).defer(*BODY_FIELDS)[:3]
     
     # Get categories for sidebar
     categories = Category.objects.all()
     
+    # Precomputed rankings; lazy, so cached sidebar fragments skip the queries
     context = {
         'page_obj': page_obj,
         'featured_posts': featured_posts,
         'categories': categories,
+        'trending_posts': rankings.trending(),
+        'popular_posts': rankings.popular(),
         'search_query': search_query,
     }
     
-    return render(request, 'blog/home.html', context)
+    return validator.apply(render(request, 'blog/home.html', context))
 
 
 def post_detail(request, slug):
     """Display a single post with its comments"""
-    post = get_object_or_404(Post, slug=slug, published=True)
+    pagecache.watch(request, 'post', 'comment', 'category')
+    post = get_object_or_404(Post.objects.with_detail_stats(), slug=slug, published=True)
+    pagecache.tag_page(request, *pagecache.post_tags(post), post_id=post.pk)
+    
+    # Revalidate before loading the comments or rendering; a revalidated
+    # page is still a view
+    validator = post_validator(request, post)
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        counters.record_view(post.pk)
+        return not_modified
     
     # Handle comment submission
     if request.method == 'POST' and request.user.is_authenticated:
         form = CommentForm(request.POST)
         if form.is_valid():
-            comment = form.save(commit=False)
-            comment.post = post
-            comment.author = request.user
-            comment.save()
-            messages.success(request, 'Your comment has been added successfully!')
+            save_comment(request, post, form)
             return redirect('blog:post_detail', slug=post.slug)
     else:
         form = CommentForm()
     
-    # Increment view count
-    post.view_count += 1
-    post.save(update_fields=['view_count'])
+    # Buffer the view; it is written to the database in batches
+    counters.record_view(post.pk)
     
-    # Get approved comments for this post
-    comments = post.comments.filter(approved=True).select_related('author')
+    # Get approved comments for this post (counted by with_detail_stats)
+    comments = list(post.comments.filter(approved=True).select_related('author'))
     
-    # Get related posts (same category, excluding current post)
-    related_posts = Post.objects.filter(
-        category=post.category,
-        published=True
-    ).exclude(id=post.id)[:3]
+    # Get related posts, precomputed by content similarity (see blog.related)
+    related_posts = related.related_posts(post)
     
     context = {
         'post': post,
@@ -82,28 +134,35 @@ def post_detail(request, slug):
         'form': form,
     }
     
-    return render(request, 'blog/post_detail.html', context)
+    return validator.apply(render(request, 'blog/post_detail.html', context))
 
 
 def category_posts(request, slug):
     """Display posts by category"""
+    pagecache.watch(request, 'post', 'category')
     category = get_object_or_404(Category, slug=slug)
+    pagecache.tag_page(request, f'category:{category.pk}')
     posts = Post.objects.filter(
         category=category,
         published=True
-    ).select_related('author')
+    ).select_related('author').defer(*BODY_FIELDS)
     
     # Pagination
-    paginator = Paginator(posts, 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts, 6)
+    
+    # Revalidate before rendering
+    validator = category_validator(request, category, page_obj)
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    page_obj.object_list = counters.attach_pending_views(page_obj.object_list)
     
     context = {
         'category': category,
         'page_obj': page_obj,
     }
     
-    return render(request, 'blog/category_posts.html', context)
+    return validator.apply(render(request, 'blog/category_posts.html', context))
 
 
 @login_required
@@ -175,16 +234,12 @@ def post_delete(request, slug):
 @login_required
 def add_comment(request, slug):
     """Add a comment to a post"""
-    post = get_object_or_404(Post, slug=slug, published=True)
+    post = get_object_or_404(Post.objects.with_detail_stats(), slug=slug, published=True)
     
     if request.method == 'POST':
         form = CommentForm(request.POST)
         if form.is_valid():
-            comment = form.save(commit=False)
-            comment.post = post
-            comment.author = request.user
-            comment.save()
-            messages.success(request, 'Your comment has been added successfully!')
+            save_comment(request, post, form)
             return redirect('blog:post_detail', slug=post.slug)
     else:
         form = CommentForm()
@@ -198,15 +253,20 @@ def add_comment(request, slug):
 @login_required
 def my_posts(request):
     """Display user's own posts"""
-    posts = Post.objects.filter(author=request.user).order_by('-created_at')
+    posts = Post.objects.filter(
+        author=request.user
+    ).select_related('category').with_comment_counts().defer(*BODY_FIELDS).order_by('-created_at')
     
     # Pagination
-    paginator = Paginator(posts, 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, posts, 6)
+    page_obj.object_list = counters.attach_pending_views(page_obj.object_list)
+    
+    # Dashboard totals across all of the user's posts
+    stats = Post.objects.author_stats(request.user)
     
     return render(request, 'blog/my_posts.html', {
         'page_obj': page_obj,
+        'stats': stats,
         'title': 'My Posts'
     })
 
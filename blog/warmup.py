@@ -0,0 +1,143 @@
+"""
+Boot-time warm-up for worker processes.
+
+A fresh worker parses and compiles every template it renders, compiles
+the URL patterns, builds the model metadata caches and loads translation
+catalogs and the static files manifest lazily, on the first requests that
+need them. ``warm_up()`` does all of that up front. Templates go into the
+cached template loader, which Django puts in front of the default loaders,
+so later requests in the process reuse the compiled templates.
+
+``post_fork`` has the signature of the gunicorn hook of the same name and
+is installed by ``gunicorn.conf.py``, so each worker warms itself up
+before it accepts requests. ``manage.py warmup`` runs the same steps and
+``manage.py warmup --compare`` measures first-request latency with and
+without them. ``BLOG_WARMUP = False`` turns the hook off.
+"""
+
+import os
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import NoReverseMatch, URLResolver, get_resolver, reverse
+from django.utils import formats, translation
+
+TEMPLATE_APPS = ('blog',)
+
+
+def template_names(app_labels=TEMPLATE_APPS):
+    """Names of the templates under ``<app>/templates/`` of each app, e.g. 'blog/home.html'"""
+    names = []
+    for label in app_labels:
+        root = Path(apps.get_app_config(label).path) / 'templates'
+        names.extend(sorted(path.relative_to(root).as_posix() for path in root.rglob('*.html')))
+    return names
+
+
+def warm_templates():
+    """Compile the blog templates into the cached loader of each Django engine"""
+    names = template_names()
+    for backend in engines.all():
+        if isinstance(backend, DjangoTemplates):
+            for name in names:
+                backend.get_template(name)
+    return len(names)
+
+
+def _compile_patterns(resolver):
+    count = 0
+    resolver.reverse_dict  # populates the reverse lookups of this resolver
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        count += 1
+        if isinstance(pattern, URLResolver):
+            count += _compile_patterns(pattern)
+    return count
+
+
+def _namespaced_names(resolver, prefix=''):
+    """``{namespace: one 'namespace:name'}`` for every namespace under ``resolver``"""
+    names = {}
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            namespace = f'{prefix}{pattern.namespace}:' if pattern.namespace else prefix
+            for key, name in _namespaced_names(pattern, namespace).items():
+                names.setdefault(key, name)
+        elif prefix and pattern.name:
+            names.setdefault(prefix, prefix + pattern.name)
+    return names
+
+
+def warm_urls():
+    """Import the URLconf and views, compile every pattern and prime namespaced reversing"""
+    with translation.override(settings.LANGUAGE_CODE):
+        count = _compile_patterns(get_resolver())
+        # reverse('blog:home') builds and caches a resolver per namespace
+        for name in _namespaced_names(get_resolver()).values():
+            try:
+                reverse(name)
+            except NoReverseMatch:  # the name needs arguments; the resolver is built anyway
+                pass
+    return count
+
+
+def warm_models():
+    """Build field caches and compile a query for every model, without touching the database"""
+    models = apps.get_models()
+    for model in models:
+        model._meta.get_fields()
+        model._default_manager.all().query.sql_with_params()
+    return len(models)
+
+
+def warm_i18n():
+    """Load the translation catalogs and date formats the templates use"""
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('Home')
+        formats.get_format('DATE_FORMAT')
+    return 1
+
+
+def warm_static():
+    """Load the static files manifest, when the storage has one"""
+    staticfiles_storage.base_url
+    return len(getattr(staticfiles_storage, 'hashed_files', {}))
+
+
+STEPS = (
+    ('templates', warm_templates),
+    ('urls', warm_urls),
+    ('models', warm_models),
+    ('i18n', warm_i18n),
+    ('static', warm_static),
+)
+
+
+def warm_up():
+    """Run every step; returns ``[(step, items, ms)]``"""
+    report = []
+    for name, step in STEPS:
+        start = time.perf_counter()
+        items = step()
+        report.append((name, items, (time.perf_counter() - start) * 1000))
+    return report
+
+
+def post_fork(server, worker):
+    """gunicorn hook: set Django up in the new worker and warm it up"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_project.settings')
+    import django
+    django.setup()
+    if not getattr(settings, 'BLOG_WARMUP', True):
+        return
+    report = warm_up()
+    total = sum(ms for _, _, ms in report)
+    worker.log.info(
+        'Worker %s warmed up in %.1fms (%s)', worker.pid, total,
+        ', '.join(f'{name} {ms:.1f}ms' for name, _, ms in report),
+    )
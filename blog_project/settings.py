@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,8 +41,21 @@ INSTALLED_APPS = [
     'blog',
 ]
 
+# Lean profile: BLOG_LEAN=1 leaves out the admin, whose import and
+# autodiscovery are a large share of start-up. manage.py sets it for the
+# batch commands in blog.lean.LEAN_COMMANDS; web workers that never serve
+# /admin/ can set it too (DEPLOYMENT.md).
+BLOG_LEAN = os.environ.get('BLOG_LEAN') == '1'
+if BLOG_LEAN:
+    INSTALLED_APPS.remove('django.contrib.admin')
+
 MIDDLEWARE = [
+    'blog.middleware.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'blog.compression.ResponseCompressionMiddleware',
+    'blog.routers.ReplicaRoutingMiddleware',
+    'blog.pagecache.AnonymousPageCacheMiddleware',
+    'blog.compression.HTMLMinifyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -62,6 +76,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'blog.context_processors.fragment_cache',
             ],
         },
     },
@@ -80,6 +95,20 @@ DATABASES = {
     }
 }
 
+# Read replicas (blog/routers.py): aliases that safe requests may read blog
+# data from. Set BLOG_SQLITE_REPLICA to a file path to try it locally with
+# a second SQLite file, refreshed by `manage.py sync_sqlite_replicas`.
+BLOG_READ_REPLICAS = []
+if os.environ.get('BLOG_SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BLOG_SQLITE_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    BLOG_READ_REPLICAS = ['replica']
+
+DATABASE_ROUTERS = ['blog.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,3 +155,95 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Blog view counter buffer: views are buffered in the cache and written
+# in batches at most once per interval (seconds). Set to 0 to rely on
+# `manage.py flush_view_counts` instead.
+BLOG_VIEW_COUNT_FLUSH_INTERVAL = 30
+
+# List view pagination: 'keyset' seeks on (created_at, id) with opaque
+# cursors; 'offset' uses django.core.paginator.Paginator. Keyset totals
+# ("Page X of Y") are cached for BLOG_PAGINATION_COUNT_TIMEOUT seconds.
+BLOG_PAGINATION = 'keyset'
+BLOG_PAGINATION_COUNT_TIMEOUT = 60
+
+# Template fragment cache (post cards, post bodies, sidebars), in seconds.
+# Fragments are also invalidated by model signals, see blog/cache.py.
+BLOG_FRAGMENT_CACHE_TIMEOUT = 600
+
+# Maximum number of ranked hits a search returns.
+BLOG_SEARCH_MAX_RESULTS = 1000
+
+# Request profiling (blog.middleware.QueryProfilingMiddleware): fraction of
+# requests to profile, 0 disables the middleware entirely. Profiled
+# requests slower than BLOG_PROFILING_SLOW_MS are logged with their queries.
+BLOG_PROFILING_SAMPLE_RATE = 0
+BLOG_PROFILING_SLOW_MS = 500
+
+# Full-page cache for anonymous GETs of the home, category and post pages
+# (blog.pagecache), in seconds; 0 disables it. Pages are purged by model
+# signals, so the timeout only bounds how stale view counts can get.
+BLOG_PAGE_CACHE_TIMEOUT = 300
+
+# Queue comment submissions and publish them in batches with
+# `manage.py process_comment_queue --loop` (see blog/comment_queue.py).
+BLOG_COMMENT_QUEUE = False
+
+# Serve home, category_posts and post_detail with the async views in
+# blog/async_views.py. Only worth it under an ASGI server (DEPLOYMENT.md).
+BLOG_ASYNC_VIEWS = False
+
+# How long a client keeps reading from the primary after a POST, so it
+# sees its own writes while the replicas catch up (seconds).
+BLOG_REPLICA_STICKY_SECONDS = 10
+
+# Trending/popular rankings (blog/rankings.py), refreshed by
+# `manage.py compute_rankings --loop`. Trending activity halves every
+# BLOG_TRENDING_HALF_LIFE_HOURS; a comment counts as this many views.
+BLOG_TRENDING_HALF_LIFE_HOURS = 6
+BLOG_RANKING_COMMENT_WEIGHT = 5
+
+# Related posts (blog/related.py): how many post_detail shows, and how many
+# TF-IDF terms per post the similarity index keeps. Rebuild the index with
+# `manage.py compute_related`; saved posts are re-scored incrementally.
+BLOG_RELATED_POSTS = 3
+BLOG_RELATED_TERMS = 16
+
+# Serve STATIC_ROOT from blog.staticfiles.StaticFilesApplication, wrapped
+# around the WSGI application, with far-future caching for hashed names.
+# Needs `collectstatic`; on in settings_production.py.
+BLOG_STATIC_HANDLER = False
+
+# Response optimization (blog/compression.py): minify HTML before the page
+# cache stores it and compress text responses with brotli or gzip.
+# BLOG_RESPONSE_ROUTES overrides these per view name or URL namespace, e.g.
+# {'blog:post_detail': {'gzip_level': 9}, 'admin': {'minify': False}}.
+BLOG_HTML_MINIFY = True
+BLOG_COMPRESSION_GZIP_LEVEL = 6
+BLOG_COMPRESSION_BROTLI_QUALITY = 5
+BLOG_COMPRESSION_MIN_SIZE = 512
+# Random padding added to gzip bodies against BREACH.
+BLOG_COMPRESSION_MAX_RANDOM_BYTES = 100
+BLOG_RESPONSE_ROUTES = {}
+
+# Compile templates and prime URL and model caches in each gunicorn worker
+# before it serves requests (gunicorn.conf.py, blog/warmup.py).
+BLOG_WARMUP = True
+
+# Comment moderation (blog/moderation.py): new comments stay hidden until
+# `manage.py moderate_comments --loop` scores them with these rules. A
+# comment reaching BLOG_MODERATION_REJECT_SCORE is rejected, one reaching
+# BLOG_MODERATION_HOLD_SCORE is held for a moderator; the rest are approved.
+BLOG_MODERATION_RULES = [
+    'blog.moderation.InactiveAuthorRule',
+    'blog.moderation.DuplicateRule',
+    'blog.moderation.LinkRule',
+    'blog.moderation.RateRule',
+    'blog.moderation.KeywordRule',
+]
+BLOG_MODERATION_HOLD_SCORE = 5
+BLOG_MODERATION_REJECT_SCORE = 10
+BLOG_MODERATION_MAX_LINKS = 2
+BLOG_MODERATION_RATE_LIMIT = 10
+BLOG_MODERATION_RATE_WINDOW = 600
+BLOG_MODERATION_KEYWORDS = []
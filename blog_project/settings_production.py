@@ -23,13 +23,46 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', ''),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Keep connections open between requests; check them before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# DB_POOL=1 replaces persistent connections with a psycopg 3 pool per worker
+# process (pip install "psycopg[binary,pool]"). Size it to the worker's threads.
+if os.environ.get('DB_POOL', '0') == '1':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '1')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '4')),
+            # Seconds a request may wait for a free connection
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1.internal,replica2.internal.
+# Safe requests read blog data from them (see blog/routers.py).
+BLOG_READ_REPLICAS = []
+for number, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    BLOG_READ_REPLICAS.append(alias)
+BLOG_REPLICA_STICKY_SECONDS = int(os.environ.get('BLOG_REPLICA_STICKY_SECONDS', '10'))
+
 # Static files configuration for production
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Content-hashed static files with .gz/.br variants built by collectstatic
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'blog.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+# Serve them from the WSGI application, before Django (blog/staticfiles.py)
+BLOG_STATIC_HANDLER = os.environ.get('BLOG_STATIC_HANDLER', '1') == '1'
+
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -54,6 +87,20 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': os.path.join(BASE_DIR, 'django.log'),
         },
+        'profiling': {
+            'level': 'INFO',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'profiling.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+        },
+        'slow_requests': {
+            'level': 'WARNING',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'slow_requests.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+        },
     },
     'loggers': {
         'django': {
@@ -61,9 +108,29 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # One JSON line per profiled request
+        'blog.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # Slow requests with every query and where it was issued
+        'blog.profiling.slow': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
+# Profile a share of requests, e.g. BLOG_PROFILING_SAMPLE_RATE=0.01 for 1%
+BLOG_PROFILING_SAMPLE_RATE = float(os.environ.get('BLOG_PROFILING_SAMPLE_RATE', '0'))
+BLOG_PROFILING_SLOW_MS = int(os.environ.get('BLOG_PROFILING_SLOW_MS', '500'))
+
+# Response compression; set to 0 when a proxy in front already compresses
+BLOG_COMPRESSION_GZIP_LEVEL = int(os.environ.get('BLOG_COMPRESSION_GZIP_LEVEL', '6'))
+BLOG_COMPRESSION_BROTLI_QUALITY = int(os.environ.get('BLOG_COMPRESSION_BROTLI_QUALITY', '5'))
+
 # Email configuration (configure with your email service)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
@@ -79,3 +146,6 @@ CACHES = {
         'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
     }
 }
+
+# Publish comments through the queue worker (see "Comment queue" in DEPLOYMENT.md)
+BLOG_COMMENT_QUEUE = os.environ.get('BLOG_COMMENT_QUEUE', '0') == '1'
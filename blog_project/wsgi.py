@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_project.settings')
 
 application = get_wsgi_application()
+
+# Serve collected static files ahead of Django, see blog/staticfiles.py
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, 'BLOG_STATIC_HANDLER', False):
+    from blog.staticfiles import StaticFilesApplication
+
+    application = StaticFilesApplication(application)
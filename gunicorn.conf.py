@@ -0,0 +1,14 @@
+"""
+Gunicorn settings, read automatically from the working directory.
+
+Each worker compiles the blog templates and primes the URL resolver and
+model metadata right after it is forked, before it accepts requests, so
+a recycled worker does not make its first visitors wait (blog/warmup.py).
+"""
+
+
+def post_fork(server, worker):
+    # Imported here so the arbiter process itself never loads Django
+    from blog.warmup import post_fork as warm_up_worker
+
+    warm_up_worker(server, worker)
@@ -3,10 +3,16 @@
 import os
 import sys
 
+from blog.lean import LEAN_COMMANDS
+
 
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_project.settings')
+    if len(sys.argv) > 1 and sys.argv[1] in LEAN_COMMANDS and os.environ.get('BLOG_LEAN') != '0':
+        os.environ['BLOG_LEAN'] = '1'
+        if '--skip-checks' not in sys.argv:
+            sys.argv.append('--skip-checks')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc: